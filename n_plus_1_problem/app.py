@@ -1,16 +1,27 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
+import os
 import sqlite3
+import sys
 from database import init_db, DB_FILE
 
+# query_counter và batch_loader dùng chung bản của week5_mini_project; thêm vào cuối
+# sys.path để database.py của thư mục này vẫn được import trước database.py của week5
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'week5_mini_project'))
+from query_counter import QueryCounter, CountingConnection, query_count
+from batch_loader import request_loader
+
 # Khởi tạo database khi ứng dụng bắt đầu
 init_db()
 
 app = Flask(__name__)
 port = 3005
 
+# Header X-Query-Count + cảnh báo khi một câu lệnh lặp lại >= 3 lần (N+1)
+QueryCounter(app)
+
 def get_db_conn():
     """Kết nối đến database."""
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, factory=CountingConnection)
     conn.row_factory = sqlite3.Row # Giúp truy cập cột bằng tên
     return conn
 
@@ -42,7 +53,7 @@ def get_authors_inefficient():
 
     conn.close()
     
-    print(f"--- Hoàn thành: Tổng cộng {1 + len(authors)} queries đã được thực thi ---")
+    print(f"--- Hoàn thành: Tổng cộng {query_count()} queries đã được thực thi ---")
     return jsonify(authors)
 
 # API GIẢI QUYẾT VẤN ĐỀ N+1 (EAGER LOADING)
@@ -61,38 +72,64 @@ def get_authors_efficient():
     print("1. Query 1: Lấy tất cả tác giả")
     cursor.execute('SELECT * FROM authors')
     authors = [dict(row) for row in cursor.fetchall()]
-    author_map = {author['id']: author for author in authors}
-    
-    # Khởi tạo list sách rỗng cho mỗi tác giả
-    for author in authors:
-        author['books'] = []
 
-    author_ids = list(author_map.keys())
-    
-    if not author_ids:
-        conn.close()
-        return jsonify(authors)
+    # --- Query 2: BatchLoader gom author_id của cả danh sách vào 1 query IN (...) ---
+    # (tự chia chunk nếu vượt giới hạn tham số của SQLite) rồi trả sách về đúng tác giả
+    print(f"2. Query 2: Lấy sách của {len(authors)} tác giả bằng BatchLoader")
+    books = request_loader('books_by_author', conn,
+                           'SELECT * FROM books WHERE author_id IN ({keys})',
+                           key='author_id', many=True)
+    for author, author_books in zip(authors, books.load_many(author['id'] for author in authors)):
+        author['books'] = author_books
 
-    # --- Query 2: Lấy tất cả sách của các tác giả đó trong 1 lần ---
-    print(f"2. Query 2: Lấy tất cả sách có author_id trong {author_ids}")
-    
-    placeholders = ', '.join('?' for _ in author_ids)
-    query = f'SELECT * FROM books WHERE author_id IN ({placeholders})'
+    conn.close()
     
-    cursor.execute(query, author_ids)
-    books = [dict(row) for row in cursor.fetchall()]
+    print(f"--- Hoàn thành: Tổng cộng {query_count()} queries đã được thực thi ---")
+    return jsonify(authors)
 
-    # --- Ghép sách vào tác giả (trong Python, không cần query nữa) ---
-    print("   => Ghép sách vào tác giả trong bộ nhớ...")
-    for book in books:
-        author_id = book['author_id']
-        if author_id in author_map:
-            author_map[author_id]['books'].append(book)
+# API MỘT QUERY: SQLITE DỰNG SẴN JSON
+AGGREGATED_QUERY = '''
+    SELECT json_object(
+        'id', a.id,
+        'name', a.name,
+        'books', json_group_array(json_object('id', b.id, 'title', b.title, 'author_id', b.author_id))
+                 FILTER (WHERE b.id IS NOT NULL)
+    )
+    FROM authors a LEFT JOIN books b ON b.author_id = a.id
+    GROUP BY a.id
+    ORDER BY a.id
+'''
 
-    conn.close()
-    
-    print("--- Hoàn thành: Tổng cộng 2 queries đã được thực thi ---")
-    return jsonify(list(author_map.values()))
+STREAM_BATCH = 500  # Số tác giả mỗi lần fetchmany / ghi ra response
+
+@app.route('/authors/aggregated', methods=['GET'])
+def get_authors_aggregated():
+    """
+    Lấy danh sách tác giả và sách của họ chỉ với 1 query.
+    SQLite dựng sẵn JSON lồng nhau bằng json_group_array(json_object(...)),
+    Python không tạo dict nào mà chỉ stream các chuỗi JSON ra client.
+    """
+    print("\n--- Yêu cầu đến /authors/aggregated (JSON aggregation) ---")
+
+    conn = get_db_conn()
+    cursor = conn.execute(AGGREGATED_QUERY)
+
+    def generate():
+        try:
+            yield '['
+            separator = ''
+            while True:
+                rows = cursor.fetchmany(STREAM_BATCH)
+                if not rows:
+                    break
+                yield separator + ','.join(row[0] for row in rows)
+                separator = ','
+            yield ']'
+        finally:
+            conn.close()
+
+    print(f"--- Hoàn thành: Tổng cộng {query_count()} query đã được thực thi ---")
+    return Response(generate(), mimetype='application/json')
 
 if __name__ == '__main__':
     print(f"N+1 Query Demo API")
@@ -100,4 +137,5 @@ if __name__ == '__main__':
     print("\nEndpoints:")
     print(f"  GET /authors/inefficient  - Gây ra lỗi N+1")
     print(f"  GET /authors/efficient    - Đã tối ưu")
+    print(f"  GET /authors/aggregated   - 1 query, JSON dựng trong SQLite")
     app.run(port=port, debug=True)
@@ -0,0 +1,90 @@
+"""
+So sánh 3 cách trả về tác giả kèm sách:
+  - inefficient: 1 + N query (N+1)
+  - efficient:   2 query (BatchLoader) + ghép dict trong Python + jsonify
+  - aggregated:  1 query, SQLite dựng JSON bằng json_group_array(json_object(...)), stream
+
+Gọi endpoint qua Flask test client (đọc hết body), đo thời gian, số query
+(header X-Query-Count), kích thước response và bộ nhớ Python cấp phát nhiều nhất.
+
+Chạy: python benchmarks/bench_authors.py [--authors 10000] [--books 50] [--repeat 3]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+ENDPOINTS = ['/authors/inefficient', '/authors/efficient', '/authors/aggregated']
+
+
+def seed(db_file, n_authors, books_per_author):
+    conn = sqlite3.connect(db_file)
+    conn.execute('DELETE FROM books')
+    conn.execute('DELETE FROM authors')
+    conn.executemany('INSERT INTO authors (id, name) VALUES (?, ?)',
+                     ((i, f'Author {i}') for i in range(1, n_authors + 1)))
+    conn.executemany('INSERT INTO books (title, author_id) VALUES (?, ?)',
+                     ((f'Book {i}-{j}', i) for i in range(1, n_authors + 1)
+                      for j in range(books_per_author)))
+    conn.commit()
+    conn.close()
+
+
+def call(client, url):
+    # Endpoint in log từng query ra stdout, bỏ đi để không làm sai số đo
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = client.get(url)
+        body = response.get_data()
+    return response, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description='N+1 vs batch vs JSON aggregation')
+    parser.add_argument('--authors', type=int, default=10000)
+    parser.add_argument('--books', type=int, default=50, help='số sách mỗi tác giả')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import app, DB_FILE
+    seed(DB_FILE, args.authors, args.books)
+    app.logger.disabled = True  # cảnh báo N+1 của QueryCounter
+    client = app.test_client()
+
+    print(f'{args.authors} tác giả x {args.books} sách, best of {args.repeat}')
+    print(f'{"endpoint":<22} {"ms":>9} {"queries":>8} {"MB body":>8} {"MB peak":>8}')
+    expected = None
+    for url in ENDPOINTS:
+        best = float('inf')
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            response, body = call(client, url)
+            best = min(best, time.perf_counter() - started)
+
+        tracemalloc.start()
+        call(client, url)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(f'{url:<22} {best * 1000:>9.1f} {response.headers["X-Query-Count"]:>8} '
+              f'{len(body) / 1e6:>8.1f} {peak / 1e6:>8.1f}')
+
+        data = json.loads(body)
+        if expected is None:
+            expected = data
+        elif data != expected:
+            print(f'✗ {url} trả về dữ liệu khác {ENDPOINTS[0]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -33,6 +33,9 @@ def init_db():
     ''')
     print("Đã tạo bảng 'books'")
 
+    # Index khóa ngoại: lấy sách theo tác giả không phải quét cả bảng books
+    cursor.execute('CREATE INDEX idx_books_author_id ON books (author_id)')
+
     # Chèn dữ liệu mẫu
     authors_data = [
         (1, 'George Orwell'),
@@ -1,15 +1,44 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
-from database import init_db
-from routes import book_bp, user_bp, borrowing_bp
+import atexit
+import os
+import cache
+import index_advisor
+import profiler
+from query_counter import QueryCounter
+from database import init_db, seed_db, init_app, add_query_hook, pool, PoolTimeout
+from routes import book_bp, user_bp, borrowing_bp, stats_bp, bulk_import_books, bulk_import_users
+from scheduler import start_overdue_sweeper
 
 app = Flask(__name__)
 CORS(app)
+init_app(app)
+atexit.register(pool.close)
+
+# Chỉ áp dụng migration còn thiếu (không xóa dữ liệu), nên mỗi worker khởi động lại đều nhanh
+init_db()
 
 # Register Blueprints (Routes)
 app.register_blueprint(book_bp, url_prefix='/api/books')
 app.register_blueprint(user_bp, url_prefix='/api/users')
 app.register_blueprint(borrowing_bp, url_prefix='/api/borrowings')
+app.register_blueprint(stats_bp, url_prefix='/api/stats')
+
+# Custom method "/api/books:bulk" không ghép được bằng url_prefix của Blueprint
+app.add_url_rule('/api/books:bulk', view_func=bulk_import_books, methods=['POST'])
+app.add_url_rule('/api/users:bulk', view_func=bulk_import_users, methods=['POST'])
+
+# Dev: log full table scan của mọi query (INDEX_ADVISOR=1 hoặc chạy bằng python app.py)
+if os.environ.get('INDEX_ADVISOR') == '1':
+    index_advisor.init_app(app)
+
+# Header Server-Timing cho mỗi request (PROFILE=1, hoặc python serve.py --profile)
+if os.environ.get('PROFILE') == '1':
+    profiler.init_app(app)
+
+# Header X-Query-Count + cảnh báo N+1 / vượt QUERY_BUDGET (QUERY_COUNTER=1)
+if os.environ.get('QUERY_COUNTER') == '1':
+    add_query_hook(QueryCounter(app, budget=int(os.environ.get('QUERY_BUDGET', 0)) or None).hook)
 
 # ==================== ROOT ROUTE ====================
 
@@ -21,10 +50,25 @@ def index():
         'endpoints': {
             'books': '/api/books',
             'users': '/api/users',
-            'borrowings': '/api/borrowings'
+            'borrowings': '/api/borrowings',
+            'stats': {
+                'loans_per_category': '/api/stats/loans-per-category',
+                'top_borrowers': '/api/stats/top-borrowers',
+                'fines': '/api/stats/fines'
+            }
         }
     })
 
+@app.route('/health')
+def health():
+    """Health check kèm số liệu connection pool"""
+    return jsonify({'success': True, 'status': 'healthy', 'db_pool': pool.stats()})
+
+@app.route('/metrics')
+def metrics():
+    """Số liệu cache (hit/miss/eviction) và connection pool"""
+    return jsonify({'success': True, 'cache': cache.stats(), 'db_pool': pool.stats()})
+
 
 # ==================== ERROR HANDLERS ====================
 
@@ -36,10 +80,29 @@ def not_found(error):
 def internal_error(error):
     return jsonify({'success': False, 'message': 'Lỗi server'}), 500
 
+@app.errorhandler(PoolTimeout)
+def pool_timeout(error):
+    return jsonify({'success': False, 'message': 'Server đang quá tải, vui lòng thử lại'}), 503
+
+# ==================== CLI ====================
+
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    """Áp dụng các migration còn thiếu"""
+    if not init_db():
+        print('✓ Database đã ở version mới nhất')
+
+@app.cli.command('seed-db')
+def seed_db_command():
+    """Thêm dữ liệu mẫu vào database trống"""
+    seed_db()
+
 # ==================== MAIN ====================
 
+# Chỉ dùng khi dev (debugger + reloader). Production: python serve.py
 if __name__ == '__main__':
-    init_db()
+    index_advisor.init_app(app)
+    start_overdue_sweeper()
     
     PORT = 3000
     print('\n' + '='*60)
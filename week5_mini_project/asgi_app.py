@@ -0,0 +1,382 @@
+"""
+ASGI entry point: uvicorn asgi_app:app --workers 4
+
+Các GET hay dùng nhất chạy async với aiosqlite, không giữ thread trong lúc chờ I/O.
+Các request còn lại (ghi, bulk, export, search...) được chuyển nguyên vẹn sang Flask app
+(app.py) trong thread pool có giới hạn (đọc và ghi dùng pool riêng), nên validate,
+transaction, invalidate cache, ETag/If-Match giống hệt bản WSGI. Body trả về được
+stream từng chunk, không đọc hết vào bộ nhớ.
+"""
+import asyncio
+import contextvars
+import os
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+
+import aiosqlite
+from quart import Quart, Blueprint, Response, request, jsonify
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+from app import app as flask_app
+from cache import book_cache, user_cache
+from database import DATABASE, PRAGMAS, USERS_QUERY, get_db
+from etag import resource_etag
+from fastjson import json_object_sql, json_list_response
+from pagination import KeysetPaginator, CursorError, parse_limit
+from streaming import negotiate_stream_mode
+
+READ_CONNECTIONS = int(os.environ.get('ASGI_READ_CONNECTIONS', 10))
+# Thread chạy các GET chuyển sang Flask (search, overdue, stats, export, stream...)
+READ_WORKERS = int(os.environ.get('ASGI_READ_WORKERS', 16))
+# SQLite chỉ có 1 writer tại một thời điểm, thêm thread ghi chỉ làm tăng tranh chấp lock
+WRITE_WORKERS = int(os.environ.get('ASGI_WRITE_WORKERS', 4))
+
+app = Quart(__name__)
+# Export / stream không phân trang có thể chạy lâu hơn timeout mặc định (60s) của Quart
+app.config['RESPONSE_TIMEOUT'] = None
+
+
+# ==================== DATABASE ====================
+
+class AsyncReadPool:
+    """Các connection aiosqlite chỉ dùng để đọc (mỗi connection chạy trên thread riêng)"""
+
+    def __init__(self, database, size):
+        self.database = database
+        self.size = size
+        self._idle = asyncio.Queue()
+
+    async def open(self):
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(self.database)
+            conn.row_factory = aiosqlite.Row
+            for pragma in PRAGMAS:
+                await conn.execute(pragma)
+            await conn.execute('PRAGMA query_only = ON')
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        while not self._idle.empty():
+            await self._idle.get_nowait().close()
+
+    async def fetchall(self, sql, params=()):
+        conn = await self._idle.get()
+        try:
+            async with conn.execute(sql, params) as cursor:
+                return await cursor.fetchall()
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def fetchone(self, sql, params=()):
+        rows = await self.fetchall(sql, params)
+        return rows[0] if rows else None
+
+
+read_pool = AsyncReadPool(DATABASE, READ_CONNECTIONS)
+# Tạo trong startup(), vì shutdown() đóng executor và app có thể được serve lại (test_app)
+write_executor = None
+# Đọc chậm (export lớn) không chiếm chỗ của request ghi
+read_executor = None
+
+# Biểu thức json_object(...) đọc schema bằng connection sync một lần khi khởi động
+_json_select = {}
+
+
+@app.before_serving
+async def startup():
+    global write_executor, read_executor
+    write_executor = ThreadPoolExecutor(max_workers=WRITE_WORKERS, thread_name_prefix='wsgi-write')
+    read_executor = ThreadPoolExecutor(max_workers=READ_WORKERS, thread_name_prefix='wsgi-read')
+    await read_pool.open()
+    with flask_app.app_context():
+        for table in ('books', 'borrowings'):
+            _json_select[table] = json_object_sql(get_db(), table)
+
+
+@app.after_serving
+async def shutdown():
+    await read_pool.close()
+    write_executor.shutdown(wait=True)
+    read_executor.shutdown(wait=True)
+
+
+@app.after_request
+async def add_cors_headers(response):
+    # Response chuyển từ Flask đã có header của flask_cors
+    response.headers.setdefault('Access-Control-Allow-Origin', '*')
+    return response
+
+
+# ==================== ETAG ====================
+
+async def collection_etag(*tables):
+    placeholders = ', '.join('?' for _ in tables)
+    rows = await read_pool.fetchall(
+        f'SELECT name, version FROM table_versions WHERE name IN ({placeholders})', tables)
+    versions = dict((row[0], row[1]) for row in rows)
+    return '-'.join(f'{table}.{versions.get(table, 0)}' for table in tables)
+
+
+def not_modified(etag):
+    response = Response('', status=304)
+    response.set_etag(etag, weak=True)
+    response.vary.add('Accept')
+    return response
+
+
+def with_etag(response, etag):
+    response.set_etag(etag, weak=True)
+    response.vary.add('Accept')
+    return response
+
+
+def is_streaming():
+    # NDJSON/stream=true chưa có bản async, để Flask xử lý (cùng luật với streaming.stream_mode)
+    return negotiate_stream_mode(request.accept_mimetypes, request.args) is not None
+
+
+def is_expanded():
+    # ?expand=book,user (batch_loader) và ETag gồm cả bảng được expand: để Flask xử lý
+    # cho body và ETag giống hệt bản WSGI
+    return bool(request.args.get('expand'))
+
+
+# ==================== BOOKS ====================
+
+book_bp = Blueprint('books', __name__)
+
+
+@book_bp.route('', methods=['GET'])
+async def get_books():
+    """Lấy danh sách sách (page-based)"""
+    if is_streaming():
+        return await forward_to_wsgi()
+    page = int(request.args.get('page', 1))
+    limit = int(request.args.get('limit', 10))
+
+    etag = await collection_etag('books')
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
+    rows = await read_pool.fetchall(f'SELECT {_json_select["books"]} FROM books LIMIT ? OFFSET ?',
+                                    (limit, (page - 1) * limit))
+    return with_etag(to_quart(json_list_response([row[0] for row in rows])), etag)
+
+
+async def load_book(book_id):
+    book = await read_pool.fetchone('SELECT * FROM books WHERE id = ?', (book_id,))
+    return dict(book) if book else None
+
+
+@book_bp.route('/<int:book_id>', methods=['GET'])
+async def get_book(book_id):
+    """Lấy sách theo ID (qua cache)"""
+    book = await book_cache.get_async(book_id, load_book)
+    if not book:
+        return jsonify({'success': False, 'message': 'Không tìm thấy sách'}), 404
+
+    etag = resource_etag('books', book)
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    return with_etag(jsonify({'success': True, 'data': book}), etag)
+
+
+# ==================== USERS ====================
+
+user_bp = Blueprint('users', __name__)
+
+
+@user_bp.route('', methods=['GET'])
+async def get_users():
+    """Lấy danh sách users (keyset pagination)"""
+    if is_streaming():
+        return await forward_to_wsgi()
+
+    etag = await collection_etag('users')
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
+    query = USERS_QUERY
+    params = []
+    status = request.args.get('status')
+    if status:
+        query += ' WHERE users.status = ?'
+        params.append(status)
+
+    paginator = KeysetPaginator([('id', 'ASC')])
+    try:
+        sql, sql_params, state = paginator.page_query(
+            query, params, cursor=request.args.get('cursor'),
+            limit=parse_limit(request.args.get('limit')))
+    except CursorError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    page = paginator.build_page(await read_pool.fetchall(sql, sql_params), state)
+
+    return with_etag(jsonify({
+        'success': True,
+        'count': len(page['data']),
+        'data': page['data'],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor']
+    }), etag)
+
+
+async def load_user(user_id):
+    user = await read_pool.fetchone(USERS_QUERY + ' WHERE users.id = ?', (user_id,))
+    return dict(user) if user else None
+
+
+@user_bp.route('/<int:user_id>', methods=['GET'])
+async def get_user(user_id):
+    """Lấy user theo ID (qua cache)"""
+    user = await user_cache.get_async(user_id, load_user)
+    if not user:
+        return jsonify({'success': False, 'message': 'Không tìm thấy người dùng'}), 404
+
+    etag = resource_etag('users', user)
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    return with_etag(jsonify({'success': True, 'data': user}), etag)
+
+
+# ==================== BORROWINGS ====================
+
+borrowing_bp = Blueprint('borrowings', __name__)
+
+
+@borrowing_bp.route('', methods=['GET'])
+async def get_borrowings():
+    """Lấy danh sách mượn sách (keyset pagination)"""
+    if is_streaming() or is_expanded():
+        return await forward_to_wsgi()
+
+    etag = await collection_etag('borrowings')
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
+    query = 'SELECT * FROM borrowings WHERE 1=1'
+    params = []
+    for arg, column in (('status', 'status'), ('userId', 'user_id'), ('bookId', 'book_id')):
+        value = request.args.get(arg)
+        if value:
+            query += f' AND {column} = ?'
+            params.append(value if arg == 'status' else int(value))
+
+    paginator = KeysetPaginator([('id', 'ASC')])
+    try:
+        sql, sql_params, state = paginator.page_query(
+            query, params, cursor=request.args.get('cursor'),
+            limit=parse_limit(request.args.get('limit')),
+            json_select=_json_select['borrowings'])
+    except CursorError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    page = paginator.build_page(await read_pool.fetchall(sql, sql_params), state)
+
+    return with_etag(to_quart(json_list_response(page['data'],
+                                                 next_cursor=page['next_cursor'],
+                                                 prev_cursor=page['prev_cursor'])), etag)
+
+
+@borrowing_bp.route('/<int:borrowing_id>', methods=['GET'])
+async def get_borrowing(borrowing_id):
+    """Lấy phiếu mượn theo ID"""
+    if is_expanded():
+        return await forward_to_wsgi()
+    borrowing = await read_pool.fetchone('SELECT * FROM borrowings WHERE id = ?', (borrowing_id,))
+    if not borrowing:
+        return jsonify({'success': False, 'message': 'Không tìm thấy phiếu mượn'}), 404
+
+    etag = resource_etag('borrowings', borrowing)
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+    return with_etag(jsonify({'success': True, 'data': dict(borrowing)}), etag)
+
+
+app.register_blueprint(book_bp, url_prefix='/api/books')
+app.register_blueprint(user_bp, url_prefix='/api/users')
+app.register_blueprint(borrowing_bp, url_prefix='/api/borrowings')
+
+
+# ==================== WSGI FALLBACK ====================
+
+def to_quart(flask_response):
+    """Chuyển Response của Flask (fastjson) sang Response của Quart"""
+    return Response(flask_response.get_data(), status=flask_response.status_code,
+                    headers=response_headers(flask_response.headers))
+
+
+def response_headers(headers):
+    # Content-Length do Quart tự tính lại theo body
+    return [(key, value) for key, value in headers.items() if key.lower() != 'content-length']
+
+
+def call_flask(method, path, query_string, headers, body):
+    """Chạy một request trên Flask app. Returns: (app_iter, status, headers), body chưa được đọc"""
+    builder = EnvironBuilder(path=path, method=method, query_string=query_string,
+                             headers=headers, data=body)
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    app_iter, status, headers = run_wsgi_app(flask_app.wsgi_app, environ)
+    return app_iter, int(status.split(' ', 1)[0]), response_headers(headers)
+
+
+def close_app_iter(app_iter, context, step):
+    # Client ngắt kết nối giữa chừng: chờ bước next() đang chạy xong rồi mới close,
+    # vì một Context không chạy được ở hai thread cùng lúc
+    if step is not None:
+        futures.wait([step])
+    # Đóng iterator để Flask teardown trả connection về pool
+    if hasattr(app_iter, 'close'):
+        context.run(app_iter.close)
+
+
+async def stream_app_iter(executor, context, app_iter):
+    """
+    Đọc body của Flask từng chunk trong executor và gửi ngay cho client
+    (Quart gửi mỗi chunk với more_body=True), bộ nhớ không phụ thuộc kích thước response.
+    Mọi bước chạy trong cùng contextvars.Context với call_flask để app/request context
+    của stream_with_context vẫn còn dù chunk được đọc ở thread khác.
+    """
+    iterator = iter(app_iter)
+    step = None
+    try:
+        while True:
+            step = executor.submit(context.run, next, iterator, None)
+            chunk = await asyncio.wrap_future(step)
+            if chunk is None:
+                break
+            if chunk:
+                yield chunk
+    finally:
+        await asyncio.get_running_loop().run_in_executor(
+            executor, close_app_iter, app_iter, context, step)
+
+
+async def forward_to_wsgi():
+    body = await request.get_data()
+    executor = read_executor if request.method in ('GET', 'HEAD', 'OPTIONS') else write_executor
+    context = contextvars.copy_context()
+    app_iter, status, headers = await asyncio.get_running_loop().run_in_executor(
+        executor, context.run, call_flask, request.method, request.path,
+        request.query_string.decode(), list(request.headers.items()), body)
+    if request.method == 'HEAD' or status in (204, 304):
+        # Không có body: Quart sẽ không đọc generator, đóng app_iter ngay
+        await asyncio.get_running_loop().run_in_executor(
+            executor, close_app_iter, app_iter, context, None)
+        return Response(b'', status=status, headers=headers)
+    return Response(stream_app_iter(executor, context, app_iter), status=status, headers=headers)
+
+
+# Route chưa có bản async (và mọi method ghi) khớp vào đây: werkzeug ưu tiên
+# rule cụ thể hơn nên GET ở trên vẫn được chọn trước
+@app.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+@app.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+async def fallback(path):
+    return await forward_to_wsgi()
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=3000)
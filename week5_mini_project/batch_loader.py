@@ -0,0 +1,98 @@
+"""
+Batch loader kiểu DataLoader: gom các key cần load trong request, chạy một câu
+SELECT ... IN (...) cho cả lô (chia chunk theo giới hạn tham số của SQLite) rồi
+trả kết quả về đúng từng chỗ gọi. Kết quả được cache trong request.
+
+    books = request_loader('books_by_author', conn,
+                           'SELECT * FROM books WHERE author_id IN ({keys})',
+                           key='author_id', many=True)
+    pending = [books.load(author['id']) for author in authors]   # chưa query
+    for author, author_books in zip(authors, pending):
+        author['books'] = author_books.get()                     # 1 query cho cả lô
+"""
+import sqlite3
+from flask import g, has_app_context
+
+# Số tham số ? tối đa trong một câu lệnh (SQLITE_MAX_VARIABLE_NUMBER mặc định)
+MAX_VARIABLES = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+
+class Pending:
+    """Kết quả của loader.load(key), chỉ query khi gọi get()"""
+    __slots__ = ('loader', 'key')
+
+    def __init__(self, loader, key):
+        self.loader = loader
+        self.key = key
+
+    def get(self):
+        return self.loader.get(self.key)
+
+
+class BatchLoader:
+    """
+    sql: câu SELECT có placeholder {keys} cho danh sách IN, ví dụ
+    'SELECT * FROM books WHERE id IN ({keys})'.
+    key: cột dùng để trả kết quả về đúng key.
+    many: True -> mỗi key là list dòng (quan hệ 1-n), False -> một dòng hoặc None.
+    """
+
+    def __init__(self, conn, sql, key='id', many=False, chunk_size=MAX_VARIABLES):
+        self.conn = conn
+        self.sql = sql
+        self.key = key
+        self.many = many
+        self.chunk_size = chunk_size
+        self._cache = {}
+        self._queue = {}  # dict giữ thứ tự, không trùng key
+
+    def load(self, key):
+        if key is not None and key not in self._cache:
+            self._queue[key] = None
+        return Pending(self, key)
+
+    def load_many(self, keys):
+        """Load cả danh sách key, trả về kết quả theo đúng thứ tự keys"""
+        keys = list(keys)
+        for key in keys:
+            self.load(key)
+        return [self.get(key) for key in keys]
+
+    def get(self, key):
+        if key is None:
+            return [] if self.many else None
+        if key not in self._cache:
+            self._queue[key] = None
+            self.dispatch()
+        return self._cache[key]
+
+    def prime(self, key, value):
+        """Đưa sẵn kết quả đã có vào cache (không cần query lại)"""
+        self._cache[key] = value
+        self._queue.pop(key, None)
+
+    def dispatch(self):
+        """Chạy query cho mọi key đang chờ"""
+        keys = list(self._queue)
+        self._queue.clear()
+        for start in range(0, len(keys), self.chunk_size):
+            chunk = keys[start:start + self.chunk_size]
+            results = {key: [] if self.many else None for key in chunk}
+            sql = self.sql.format(keys=', '.join('?' * len(chunk)))
+            for row in self.conn.execute(sql, chunk):
+                row = dict(row)
+                if self.many:
+                    results.setdefault(row[self.key], []).append(row)
+                else:
+                    results[row[self.key]] = row
+            self._cache.update(results)
+
+
+def request_loader(name, conn, sql, key='id', many=False):
+    """BatchLoader dùng chung trong request hiện tại (cache theo name trên flask.g)"""
+    if not has_app_context():
+        return BatchLoader(conn, sql, key, many)
+    loaders = g.setdefault('_batch_loaders', {})
+    if name not in loaders:
+        loaders[name] = BatchLoader(conn, sql, key, many)
+    return loaders[name]
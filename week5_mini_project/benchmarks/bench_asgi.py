@@ -0,0 +1,141 @@
+"""
+So sánh throughput khi nhiều connection đồng thời: Flask (WSGI, server threaded của
+werkzeug như app.run) với asgi_app.py (Quart + aiosqlite chạy bằng uvicorn).
+
+Mỗi client là một thread giữ 1 connection keep-alive và gửi request liên tục
+trong --duration giây; đo số request/giây và latency p50/p99 ở từng mức concurrency.
+
+Cần: pip install quart aiosqlite uvicorn
+Chạy: python benchmarks/bench_asgi.py [--concurrency 10,50,200] [--duration 5]
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+SERVERS = {
+    'wsgi': [sys.executable, '-c',
+             'import sys; from werkzeug.serving import run_simple; from app import app; '
+             'run_simple("127.0.0.1", int(sys.argv[1]), app, threaded=True)'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--host', '127.0.0.1',
+             '--log-level', 'warning', '--port'],
+}
+
+URLS = ['/api/books/1', '/api/users?limit=20', '/api/borrowings?limit=50']
+
+
+def seed(n_books, n_users, n_borrowings):
+    import database
+    database.init_db()
+    conn = database.get_db()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, published_year, category, quantity, available)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(f'Book {i}', f'Author {i % 97}', f'978-{i}', 1990 + i % 30, f'Category {i % 7}', 5, 5)
+          for i in range(n_books)])
+    conn.executemany('INSERT INTO users (name, email, phone, address, status) VALUES (?, ?, ?, ?, ?)',
+                     [(f'User {i}', f'user{i}@example.com', '0123456789', '', 'active')
+                      for i in range(n_users)])
+    conn.executemany('''
+        INSERT INTO borrowings (user_id, book_id, borrow_date, due_date, status, fine)
+        VALUES (?, ?, '2024-01-01', '2024-01-15', 'borrowed', 0)
+    ''', [(1 + i % n_users, 1 + i % n_books) for i in range(n_borrowings)])
+    conn.commit()
+    conn.close()
+
+
+def start_server(command, port, workdir, env=None):
+    """Chạy server (command + [port]) và chờ /health trả lời"""
+    env = dict(os.environ, PYTHONPATH=APP_DIR, **(env or {}))
+    proc = subprocess.Popen(command + [str(port)], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/health')
+            conn.getresponse().read()
+            return proc
+        except OSError:
+            time.sleep(0.02)
+    proc.kill()
+    raise RuntimeError(f'{" ".join(command)} không khởi động được')
+
+
+def load(port, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client(index):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        i = index
+        while time.perf_counter() < stop_at:
+            url = URLS[i % len(URLS)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                conn.request('GET', url)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise OSError(response.status)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            local.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    if not latencies:
+        return 0, 0, 0, errors[0]
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    return len(latencies) / duration, p50, p99, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WSGI vs ASGI throughput')
+    parser.add_argument('--concurrency', default='10,50,200')
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--servers', default='wsgi,asgi')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    seed(n_books=10000, n_users=1000, n_borrowings=10000)
+
+    print(f'{"server":<6} {"conc":>5} {"req/s":>9} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+    for port, name in enumerate(args.servers.split(','), start=3100):
+        proc = start_server(SERVERS[name], port, workdir)
+        try:
+            for concurrency in (int(c) for c in args.concurrency.split(',')):
+                rps, p50, p99, errors = load(port, concurrency, args.duration)
+                print(f'{name:<6} {concurrency:>5} {rps:>9.0f} {p50:>8.2f} {p99:>8.2f} {errors:>7}')
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
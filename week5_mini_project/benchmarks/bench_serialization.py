@@ -0,0 +1,87 @@
+"""
+Microbenchmark serialize list endpoint: cách cũ (sqlite3.Row -> dict -> jsonify)
+so với json_object() của SQLite (fastjson.py).
+
+Đo cả 2 mức:
+  - serialize: chỉ phần query + encode JSON
+  - endpoint:  gọi /api/books và /api/borrowings qua Flask test client
+
+Chạy: python benchmarks/bench_serialization.py [--rows 100] [--repeat 300]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+
+def seed(database, n_books, n_borrowings):
+    conn = database.get_db()
+    conn.executemany('''
+        INSERT INTO books (title, author, isbn, published_year, category, quantity, available)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [(f'Book {i}', f'Author {i % 97}', f'978-{i}', 1990 + i % 30, f'Category {i % 7}', 5, 5)
+          for i in range(n_books)])
+    conn.executemany('''
+        INSERT INTO borrowings (user_id, book_id, borrow_date, due_date, status, fine)
+        VALUES (?, ?, '2024-01-01', '2024-01-15', 'borrowed', 0)
+    ''', [(1 + i % 2, 1 + i % n_books) for i in range(n_borrowings)])
+    conn.commit()
+    conn.close()
+
+
+def report(label, old, new, repeat):
+    old_ms = old / repeat * 1000
+    new_ms = new / repeat * 1000
+    print(f'{label:<32} dict+jsonify {old_ms:8.3f}ms   json_object {new_ms:8.3f}ms   x{old / new:.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='So sánh tốc độ serialize JSON')
+    parser.add_argument('--rows', type=int, default=100, help='Số dòng mỗi response')
+    parser.add_argument('--repeat', type=int, default=300)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp())
+    import database
+    from app import app
+    from flask import jsonify
+    from fastjson import json_object_sql, json_list_response
+
+    database.init_db()
+    seed(database, n_books=10000, n_borrowings=10000)
+
+    print(f'{args.rows} dòng/response, {args.repeat} lần lặp\n')
+
+    for table in ('books', 'borrowings'):
+        with app.app_context():
+            conn = database.get_db()
+
+            def old_path():
+                rows = conn.execute(f'SELECT * FROM {table} LIMIT ?', (args.rows,)).fetchall()
+                data = [dict(row) for row in rows]
+                return jsonify({'success': True, 'count': len(data), 'data': data}).get_data()
+
+            json_select = json_object_sql(conn, table)
+
+            def new_path():
+                rows = conn.execute(f'SELECT {json_select} FROM {table} LIMIT ?', (args.rows,)).fetchall()
+                return json_list_response([row[0] for row in rows]).get_data()
+
+            old = timeit.timeit(old_path, number=args.repeat)
+            new = timeit.timeit(new_path, number=args.repeat)
+            report(f'serialize {table}', old, new, args.repeat)
+
+    client = app.test_client()
+    limit = min(args.rows, 100)
+    for url in (f'/api/books?limit={limit}', f'/api/borrowings?limit={limit}'):
+        # Thời gian end-to-end của endpoint (đã dùng json_object)
+        new = timeit.timeit(lambda: client.get(url).get_data(), number=args.repeat)
+        print(f'endpoint GET {url:<30} {new / args.repeat * 1000:8.3f}ms/request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+So sánh cách chạy server: dev server của Flask (app.run(debug=True)) với
+serve.py (gunicorn / waitress).
+
+Đo:
+  - startup: từ lúc chạy lệnh tới khi /health trả lời lần đầu
+  - steady-state: req/s và latency p50/p99 (cùng bộ URL với bench_asgi.py)
+
+Server chưa cài (gunicorn, waitress) sẽ được bỏ qua.
+Chạy: python benchmarks/bench_server.py [--concurrency 16,64] [--duration 5]
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+from bench_asgi import APP_DIR, load, seed, start_server
+
+SERVE = os.path.join(APP_DIR, 'serve.py')
+
+# (tên, module cần có, lệnh chạy - port được thêm vào cuối, env)
+CONFIGS = [
+    ('flask-dev', 'flask', [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--debug', '--port'], {}),
+    ('gunicorn', 'gunicorn', [sys.executable, SERVE, '--server', 'gunicorn', '--port'], {'ACCESS_LOG': ''}),
+    ('gunicorn-nopreload', 'gunicorn',
+     [sys.executable, SERVE, '--server', 'gunicorn', '--no-preload', '--port'], {'ACCESS_LOG': ''}),
+    ('waitress', 'waitress', [sys.executable, SERVE, '--server', 'waitress', '--port'], {}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup time và RPS của các cách chạy server')
+    parser.add_argument('--concurrency', default='16,64')
+    parser.add_argument('--duration', type=float, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    seed(n_books=10000, n_users=1000, n_borrowings=10000)
+
+    print(f'{"server":<20} {"startup":>9} {"conc":>5} {"req/s":>9} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+    for port, (name, module, command, env) in enumerate(CONFIGS, start=3200):
+        if importlib.util.find_spec(module) is None:
+            print(f'{name:<20} (bỏ qua: chưa cài {module})')
+            continue
+
+        started = time.perf_counter()
+        proc = start_server(command, port, workdir, env)
+        startup_ms = (time.perf_counter() - started) * 1000
+        try:
+            for concurrency in (int(c) for c in args.concurrency.split(',')):
+                rps, p50, p99, errors = load(port, concurrency, args.duration)
+                print(f'{name:<20} {startup_ms:>7.0f}ms {concurrency:>5} {rps:>9.0f} '
+                      f'{p50:>8.2f} {p99:>8.2f} {errors:>7}')
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
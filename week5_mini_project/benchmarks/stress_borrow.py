@@ -0,0 +1,105 @@
+"""
+Stress test mượn/trả sách đồng thời.
+
+Nhiều thread cùng mượn một cuốn sách có số lượng giới hạn, sau đó cùng trả.
+Kiểm tra bất biến: available không âm, số phiếu mượn thành công đúng bằng
+quantity, và available + số sách đang mượn luôn bằng quantity.
+
+Chạy: python benchmarks/stress_borrow.py [--threads 64] [--quantity 10]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stress test mượn/trả sách đồng thời')
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--quantity', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    # Database tạm, không đụng vào library.db thật
+    os.chdir(tempfile.mkdtemp())
+    import database
+    from app import app
+
+    database.init_db()
+    conn = database.get_db()
+    conn.execute('''
+        INSERT INTO books (title, author, isbn, published_year, category, quantity, available)
+        VALUES ('Stress Book', 'Tester', '000-stress', 2020, 'Test', ?, ?)
+    ''', (args.quantity, args.quantity))
+    book_id = conn.execute("SELECT id FROM books WHERE isbn = '000-stress'").fetchone()[0]
+    conn.executemany('INSERT INTO users (name, email, phone, address, status) VALUES (?, ?, ?, ?, ?)',
+                     [(f'User {i}', f'stress{i}@example.com', '0123456789', '', 'active')
+                      for i in range(args.threads)])
+    conn.commit()
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE email LIKE 'stress%'")]
+    conn.close()
+
+    def check_invariants(label):
+        conn = database.get_db()
+        available, quantity = conn.execute('SELECT available, quantity FROM books WHERE id = ?',
+                                           (book_id,)).fetchone()
+        active = conn.execute("SELECT COUNT(*) FROM borrowings WHERE book_id = ? "
+                              "AND status IN ('borrowed', 'overdue')", (book_id,)).fetchone()[0]
+        conn.close()
+        assert available >= 0, f'{label}: available âm ({available})'
+        assert available + active == quantity, \
+            f'{label}: available={available} + đang mượn={active} != quantity={quantity}'
+        return available, active
+
+    def run_concurrently(worker, items):
+        barrier = threading.Barrier(len(items))
+        results = [None] * len(items)
+
+        def target(i, item):
+            client = app.test_client()
+            barrier.wait()
+            results[i] = worker(client, item)
+
+        threads = [threading.Thread(target=target, args=(i, item)) for i, item in enumerate(items)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results, time.perf_counter() - started
+
+    for round_no in range(1, args.rounds + 1):
+        # Tất cả thread cùng mượn một cuốn
+        responses, elapsed = run_concurrently(
+            lambda client, user_id: client.post('/api/borrowings', json={'user_id': user_id, 'book_id': book_id}),
+            user_ids)
+        borrowed = [r.get_json()['data']['id'] for r in responses if r.status_code == 201]
+        statuses = sorted({r.status_code for r in responses})
+        available, active = check_invariants(f'round {round_no} borrow')
+        assert len(borrowed) == args.quantity, \
+            f'round {round_no}: {len(borrowed)} lượt mượn thành công, mong đợi {args.quantity}'
+        print(f'round {round_no}: borrow  {len(responses)} requests in {elapsed * 1000:.1f}ms '
+              f'-> {len(borrowed)} ok, status={statuses}, available={available}, active={active}')
+
+        # Trả mỗi phiếu 2 lần song song: chỉ một lần được chấp nhận
+        responses, elapsed = run_concurrently(
+            lambda client, borrowing_id: client.patch(f'/api/borrowings/{borrowing_id}/return'),
+            borrowed + borrowed)
+        returned = sum(1 for r in responses if r.status_code == 200)
+        available, active = check_invariants(f'round {round_no} return')
+        assert returned == len(borrowed), f'round {round_no}: {returned} lượt trả, mong đợi {len(borrowed)}'
+        assert available == args.quantity and active == 0
+        print(f'round {round_no}: return  {len(responses)} requests in {elapsed * 1000:.1f}ms '
+              f'-> {returned} ok, available={available}')
+
+    print('✓ Tất cả bất biến đều đúng')
+    print('pool:', database.pool.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+import sqlite3
+from database import run_in_transaction
+
+# Số dòng mỗi transaction khi import
+IMPORT_BATCH_SIZE = 1000
+# Số lỗi tối đa trả về trong response
+MAX_REPORTED_ERRORS = 100
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+CSV_TYPES = ('text/csv', 'application/csv')
+
+
+class UnsupportedFormat(ValueError):
+    """Content-Type không hỗ trợ cho bulk import"""
+
+
+def read_records(stream, content_type):
+    """
+    Đọc từng record từ request body (NDJSON hoặc CSV) mà không load toàn bộ vào bộ nhớ
+    Yields: (line_no, record_dict | None, error | None)
+    """
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+
+    if mimetype in NDJSON_TYPES:
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_no, None, 'JSON không hợp lệ'
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, 'Mỗi dòng phải là một JSON object'
+                continue
+            yield line_no, record, None
+
+    elif mimetype in CSV_TYPES:
+        # line_no tính cả dòng header
+        for line_no, record in enumerate(csv.DictReader(text), start=2):
+            # Ô trống trong CSV coi như không truyền giá trị
+            yield line_no, {k: v for k, v in record.items() if k and v not in ('', None)}, None
+
+    else:
+        raise UnsupportedFormat('Content-Type phải là application/x-ndjson hoặc text/csv')
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def bulk_upsert(conn, records, validator, prepare, sql, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Validate + upsert theo từng batch (mỗi batch 1 transaction, 1 executemany).
+    validator: validation.Validator, chạy validate_many() cho cả batch
+    prepare(record) -> (params, errors) cho record đã hợp lệ
+    Returns: {'received', 'imported', 'failed', 'errors'}
+    """
+    summary = {'received': 0, 'imported': 0, 'failed': 0, 'errors': []}
+
+    def report(line_no, errors):
+        summary['failed'] += 1
+        if len(summary['errors']) < MAX_REPORTED_ERRORS:
+            summary['errors'].append({'line': line_no, 'errors': errors})
+
+    for chunk in _chunks(records, batch_size):
+        rows = []
+        results = iter(validator.validate_many([record for _, record, error in chunk if not error]))
+        for line_no, record, error in chunk:
+            summary['received'] += 1
+            if error:
+                report(line_no, [error])
+                continue
+            is_valid, errors = next(results)
+            if is_valid:
+                params, errors = prepare(record)
+            if errors:
+                report(line_no, errors)
+            else:
+                rows.append((line_no, params))
+
+        if not rows:
+            continue
+
+        def write(cursor):
+            cursor.execute('SAVEPOINT bulk_chunk')
+            try:
+                cursor.executemany(sql, [params for _, params in rows])
+                cursor.execute('RELEASE bulk_chunk')
+                return len(rows), []
+            except sqlite3.IntegrityError:
+                cursor.execute('ROLLBACK TO bulk_chunk')
+                cursor.execute('RELEASE bulk_chunk')
+            # Có dòng vi phạm constraint: ghi từng dòng để biết dòng nào lỗi
+            imported, failed = 0, []
+            for line_no, params in rows:
+                cursor.execute('SAVEPOINT bulk_row')
+                try:
+                    cursor.execute(sql, params)
+                    imported += 1
+                except sqlite3.IntegrityError as e:
+                    cursor.execute('ROLLBACK TO bulk_row')
+                    failed.append((line_no, [str(e)]))
+                cursor.execute('RELEASE bulk_row')
+            return imported, failed
+
+        imported, failed = run_in_transaction(conn, write)
+        summary['imported'] += imported
+        for line_no, errors in failed:
+            report(line_no, errors)
+
+    return summary
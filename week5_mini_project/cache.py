@@ -0,0 +1,247 @@
+import fnmatch
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # redis là optional, chỉ cần khi CACHE_URL=redis://...
+    redis = None
+
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 60))
+CACHE_MAXSIZE = int(os.environ.get('CACHE_MAXSIZE', 1024))
+# Không đặt: LRU trong process
+# memory://: backend kiểu Redis chạy trong process (dùng khi dev/test)
+# redis://host:6379/0: Redis dùng chung cho mọi gunicorn worker
+CACHE_URL = os.environ.get('CACHE_URL')
+
+
+# ==================== BACKENDS ====================
+
+class LRUCache:
+    """LRU + TTL trong process (mỗi worker một bản)"""
+
+    def __init__(self, maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Returns: (found, value)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                return False, None
+            self._data.move_to_end(key)
+            return True, entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self, prefix=''):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def stats(self):
+        return {
+            'backend': 'lru',
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+class MemoryRedis:
+    """
+    Stand-in cho redis.Redis (chỉ các lệnh RedisBackend dùng), chạy trong process.
+    Dùng để chạy thử code path shared cache khi không có Redis server.
+    """
+
+    def __init__(self):
+        self._data = {}  # key -> (expires_at | None, bytes)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                del self._data[key]
+                return None
+            return entry[1]
+
+    def set(self, key, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode()
+        with self._lock:
+            self._data[key] = (time.monotonic() + ex if ex else None, value)
+        return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def scan_iter(self, match='*'):
+        with self._lock:
+            keys = list(self._data)
+        return (key for key in keys if fnmatch.fnmatchcase(key, match))
+
+
+class RedisBackend:
+    """Cache dùng chung giữa các worker: value lưu dạng JSON, hết hạn bằng TTL của Redis"""
+
+    def __init__(self, client, ttl=CACHE_TTL, prefix='library:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return False, None
+        return True, json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self, prefix=''):
+        keys = list(self.client.scan_iter(match=self.prefix + prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        # Eviction/size do Redis quản lý (INFO stats), ở đây chỉ báo cấu hình
+        return {'backend': type(self.client).__name__, 'ttl': self.ttl}
+
+
+def make_backend(url=CACHE_URL):
+    """Chọn backend theo CACHE_URL"""
+    if not url:
+        return LRUCache()
+    if url == 'memory://':
+        return RedisBackend(MemoryRedis())
+    if redis is None:
+        raise RuntimeError('CACHE_URL trỏ tới Redis nhưng chưa cài package redis (pip install redis)')
+    return RedisBackend(redis.Redis.from_url(url))
+
+
+# ==================== ENTITY CACHE ====================
+
+class EntityCache:
+    """
+    Read-through cache theo id cho một loại entity (books, users).
+    Route ghi phải gọi invalidate() sau khi commit.
+    """
+
+    def __init__(self, namespace, backend):
+        self.namespace = namespace
+        self.backend = backend
+        self._lock = threading.Lock()
+        # Tăng mỗi lần invalidate: load bắt đầu trước một lần invalidate sẽ không ghi đè
+        # giá trị cũ vào cache (trong cùng process)
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key(self, entity_id):
+        return f'{self.namespace}:{entity_id}'
+
+    def get(self, entity_id, loader):
+        """Lấy từ cache, nếu miss thì gọi loader(entity_id) -> dict | None"""
+        found, value = self.backend.get(self._key(entity_id))
+        with self._lock:
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            generation = self._generation
+
+        value = loader(entity_id)
+        if value is not None:
+            with self._lock:
+                stale = generation != self._generation
+            if not stale:
+                self.backend.set(self._key(entity_id), value)
+        return value
+
+    async def get_async(self, entity_id, loader):
+        """Như get() nhưng loader là coroutine (dùng cho asgi_app.py)"""
+        found, value = self.backend.get(self._key(entity_id))
+        with self._lock:
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            generation = self._generation
+
+        value = await loader(entity_id)
+        if value is not None:
+            with self._lock:
+                stale = generation != self._generation
+            if not stale:
+                self.backend.set(self._key(entity_id), value)
+        return value
+
+    def invalidate(self, *entity_ids):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(entity_ids)
+        self.backend.delete(*[self._key(entity_id) for entity_id in entity_ids])
+
+    def clear(self):
+        """Xóa toàn bộ entity của namespace (dùng sau bulk import)"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+        self.backend.clear(self.namespace + ':')
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'invalidations': self.invalidations
+        }
+
+
+backend = make_backend()
+book_cache = EntityCache('books', backend)
+user_cache = EntityCache('users', backend)
+
+
+def stats():
+    """Số liệu cho /metrics"""
+    return {
+        'backend': backend.stats(),
+        'books': book_cache.stats(),
+        'users': user_cache.stats()
+    }
@@ -1,90 +1,350 @@
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty, Full
+from flask import g, has_app_context
+from migrations import migrate
 
 DATABASE = 'library.db'
 
+# Cấu hình connection pool
+POOL_SIZE = 10              # Số connection tối đa mở đồng thời
+POOL_TIMEOUT = 5            # Số giây chờ khi pool đã hết connection
+POOL_HEALTH_CHECK_AFTER = 30  # Ping lại connection đã idle quá số giây này
+
+# Retry khi transaction ghi gặp SQLITE_BUSY (sau khi busy_timeout đã hết)
+TX_RETRIES = 5
+TX_RETRY_BACKOFF = 0.05     # giây, tăng gấp đôi sau mỗi lần thử
+
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',       # Reader không bị block bởi writer
+    'PRAGMA synchronous = NORMAL',     # An toàn với WAL, ít fsync hơn FULL
+    'PRAGMA busy_timeout = 5000',      # Chờ lock thay vì lỗi ngay "database is locked"
+    'PRAGMA cache_size = -16000',      # ~16MB page cache cho mỗi connection
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA mmap_size = 134217728',    # 128MB memory-mapped I/O
+)
+
+
+# ==================== QUERY HOOKS ====================
+
+# Các hàm hook(conn, sql, params, elapsed) được gọi sau mỗi câu lệnh thành công
+# (index advisor, đếm query...). Chỉ connection tạo sau khi có hook mới được trace.
+query_hooks = []
+
+
+def add_query_hook(hook):
+    """Đăng ký hook, cần gọi trước khi pool mở connection đầu tiên"""
+    if hook not in query_hooks:
+        query_hooks.append(hook)
+
+
+class TracedCursor(sqlite3.Cursor):
+    """Cursor gọi query_hooks sau mỗi execute/executemany"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        result = super().execute(sql, parameters)
+        elapsed = time.perf_counter() - started
+        for hook in query_hooks:
+            hook(self.connection, sql, parameters, elapsed)
+        return result
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        result = super().executemany(sql, seq_of_parameters)
+        elapsed = time.perf_counter() - started
+        for hook in query_hooks:
+            hook(self.connection, sql, None, elapsed)
+        return result
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection mà mọi câu lệnh đều đi qua TracedCursor"""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class PoolTimeout(Exception):
+    """Hết thời gian chờ lấy connection từ pool"""
+
+
+class ConnectionPool:
+    """Pool các connection SQLite dùng chung giữa các request và thread"""
+
+    def __init__(self, database, size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 health_check_after=POOL_HEALTH_CHECK_AFTER):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+        self._idle = LifoQueue(maxsize=size)   # LIFO để tái sử dụng connection "nóng" (page cache còn)
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._closed = False
+        self._stats = {
+            'created': 0,
+            'acquired': 0,
+            'released': 0,
+            'discarded': 0,
+            'health_checks': 0,
+            'timeouts': 0,
+            'wait_time_ms': 0.0,
+        }
+
+    def _connect(self):
+        factory = TracedConnection if query_hooks else sqlite3.Connection
+        conn = sqlite3.connect(self.database, check_same_thread=False, factory=factory)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._stats['created'] += 1
+        return conn
+
+    def _is_healthy(self, conn):
+        """Ping connection nếu nó đã idle quá lâu"""
+        last_used = self._last_used.get(id(conn), 0)
+        if time.monotonic() - last_used < self.health_check_after:
+            return True
+        with self._lock:
+            self._stats['health_checks'] += 1
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._stats['discarded'] += 1
+
+    def acquire(self):
+        """Lấy một connection, tạo mới nếu pool chưa đầy"""
+        if self._closed:
+            raise PoolTimeout('Connection pool đã đóng')
+
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeout(f'Không lấy được connection sau {self.timeout}s')
+
+        try:
+            conn = None
+            while conn is None:
+                try:
+                    conn = self._idle.get_nowait()
+                except Empty:
+                    conn = self._connect()
+                    break
+                if not self._is_healthy(conn):
+                    self._discard(conn)
+                    conn = None
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._stats['acquired'] += 1
+            self._stats['wait_time_ms'] += (time.monotonic() - started) * 1000
+        return conn
+
+    def release(self, conn):
+        """Trả connection về pool (rollback transaction còn dang dở)"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._closed:
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._idle.put_nowait(conn)
+        except (sqlite3.Error, Full):
+            self._discard(conn)
+        finally:
+            self._slots.release()
+            with self._lock:
+                self._stats['released'] += 1
+
+    def close(self):
+        """Đóng toàn bộ connection đang idle (dùng khi shutdown)"""
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except Empty:
+                break
+
+    def drain(self, timeout=POOL_TIMEOUT):
+        """
+        Graceful shutdown: ngừng cấp connection mới, chờ request đang chạy trả connection
+        (release() sẽ đóng luôn) tối đa timeout giây.
+        Returns: True nếu mọi connection đã được đóng
+        """
+        self.close()
+        deadline = time.monotonic() + timeout
+        while self.stats()['in_use'] > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.stats()['in_use'] == 0
+
+    def stats(self):
+        """Số liệu của pool cho endpoint metrics"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['size'] = self.size
+        stats['idle'] = self._idle.qsize()
+        stats['in_use'] = stats['acquired'] - stats['released']
+        stats['wait_time_ms'] = round(stats['wait_time_ms'], 3)
+        return stats
+
+
+pool = ConnectionPool(DATABASE)
+
+
+# ==================== ACTIVE LOANS ====================
+
+# Phiếu mượn có status 'borrowed' hoặc 'overdue' là sách user vẫn đang giữ.
+# users kèm borrowed_books (JSON array book_id) suy ra từ borrowings qua
+# index (user_id, status), giữ nguyên format response cũ của cột borrowed_books
+USERS_QUERY = '''
+    SELECT users.*,
+           (SELECT json_group_array(b.book_id) FROM borrowings b
+            WHERE b.user_id = users.id AND b.status IN ('borrowed', 'overdue')) AS borrowed_books
+    FROM users
+'''
+
+
+def count_active_loans(conn, user_id):
+    """Số sách user đang giữ (1 COUNT trên index borrowings(user_id, status))"""
+    return conn.execute(
+        "SELECT COUNT(*) FROM borrowings WHERE user_id = ? AND status IN ('borrowed', 'overdue')",
+        (user_id,)).fetchone()[0]
+
+
 def get_db():
-    """Kết nối database"""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Lấy connection từ pool, gắn với app context hiện tại"""
+    if not has_app_context():
+        # Script/CLI ngoài Flask: connection riêng, người gọi tự close()
+        conn = sqlite3.connect(DATABASE)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    if 'db' not in g:
+        g.db = pool.acquire()
+    return g.db
+
+
+def close_db(error=None):
+    """Trả connection về pool khi app context kết thúc"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        pool.release(conn)
+
+
+def init_app(app):
+    """Đăng ký pool với Flask app"""
+    app.teardown_appcontext(close_db)
+
+
+# ==================== TRANSACTIONS ====================
+
+def is_busy_error(error):
+    """Lỗi do database đang bị khóa bởi writer khác"""
+    name = getattr(error, 'sqlite_errorname', '')
+    return name in ('SQLITE_BUSY', 'SQLITE_LOCKED') or 'locked' in str(error)
+
+
+@contextmanager
+def transaction(conn):
+    """
+    BEGIN IMMEDIATE ... COMMIT: lấy write lock ngay từ đầu, nên các bước
+    kiểm tra + cập nhật bên trong không bị request khác chen vào giữa
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def run_in_transaction(conn, fn, retries=TX_RETRIES, backoff=TX_RETRY_BACKOFF):
+    """Chạy fn(cursor) trong transaction, thử lại khi gặp SQLITE_BUSY"""
+    for attempt in range(retries + 1):
+        try:
+            with transaction(conn) as cursor:
+                return fn(cursor)
+        except sqlite3.OperationalError as e:
+            if not is_busy_error(e) or attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt))
+
 
 def init_db():
-    """Khởi tạo database với schema và dữ liệu mẫu"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Drop tables nếu tồn tại
-    cursor.execute('DROP TABLE IF EXISTS borrowings')
-    cursor.execute('DROP TABLE IF EXISTS books')
-    cursor.execute('DROP TABLE IF EXISTS users')
-    
-    # Tạo bảng Books
-    cursor.execute('''
-        CREATE TABLE books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author TEXT NOT NULL,
-            isbn TEXT UNIQUE NOT NULL,
-            published_year INTEGER,
-            category TEXT DEFAULT 'Uncategorized',
-            quantity INTEGER DEFAULT 1,
-            available INTEGER DEFAULT 1
-        )
-    ''')
-    
-    # Tạo bảng Users
-    cursor.execute('''
-        CREATE TABLE users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            phone TEXT NOT NULL,
-            address TEXT,
-            status TEXT DEFAULT 'active',
-            borrowed_books TEXT DEFAULT '[]'
-        )
-    ''')
-    
-    # Tạo bảng Borrowings
-    cursor.execute('''
-        CREATE TABLE borrowings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            book_id INTEGER NOT NULL,
-            borrow_date TEXT NOT NULL,
-            due_date TEXT NOT NULL,
-            return_date TEXT,
-            status TEXT DEFAULT 'borrowed',
-            fine REAL DEFAULT 0
-        )
-    ''')
-    
-    # Insert dữ liệu mẫu - Books
-    sample_books = [
-        ('Clean Code', 'Robert C. Martin', '9780132350884', 2008, 'Programming', 5, 5),
-        ('The Pragmatic Programmer', 'Andrew Hunt, David Thomas', '9780201616224', 1999, 'Programming', 3, 3),
-        ('Design Patterns', 'Gang of Four', '9780201633610', 1994, 'Programming', 4, 4),
-        ('Introduction to Algorithms', 'Thomas H. Cormen', '9780262033848', 2009, 'Algorithms', 2, 2),
-        ('JavaScript: The Good Parts', 'Douglas Crockford', '9780596517748', 2008, 'Programming', 6, 6),
-    ]
+    """Áp dụng các migration còn thiếu (an toàn khi gọi mỗi lần khởi động, không xóa dữ liệu)"""
+    started = time.perf_counter()
+    conn = sqlite3.connect(DATABASE)
+    try:
+        applied = migrate(conn)
+    finally:
+        conn.close()
     
-    cursor.executemany('''
-        INSERT INTO books (title, author, isbn, published_year, category, quantity, available)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', sample_books)
+    elapsed = (time.perf_counter() - started) * 1000
+    if applied:
+        print(f'✓ Database migrated to version {applied[-1]} ({elapsed:.1f}ms)')
+    return applied
+
+
+def seed_db():
+    """Thêm dữ liệu mẫu vào các bảng còn trống (chạy bằng: flask --app app seed-db)"""
+    init_db()
+    conn = sqlite3.connect(DATABASE)
+    cursor = conn.cursor()
     
-    # Insert dữ liệu mẫu - Users
-    sample_users = [
-        ('Nguyễn Văn A', 'nguyenvana@example.com', '0123456789', 'Hà Nội', 'active', '[]'),
-        ('Trần Thị B', 'tranthib@example.com', '0987654321', 'TP. HCM', 'active', '[]'),
-    ]
+    if cursor.execute('SELECT COUNT(*) FROM books').fetchone()[0] == 0:
+        # Insert dữ liệu mẫu - Books
+        sample_books = [
+            ('Clean Code', 'Robert C. Martin', '9780132350884', 2008, 'Programming', 5, 5),
+            ('The Pragmatic Programmer', 'Andrew Hunt, David Thomas', '9780201616224', 1999, 'Programming', 3, 3),
+            ('Design Patterns', 'Gang of Four', '9780201633610', 1994, 'Programming', 4, 4),
+            ('Introduction to Algorithms', 'Thomas H. Cormen', '9780262033848', 2009, 'Algorithms', 2, 2),
+            ('JavaScript: The Good Parts', 'Douglas Crockford', '9780596517748', 2008, 'Programming', 6, 6),
+        ]
+        
+        cursor.executemany('''
+            INSERT INTO books (title, author, isbn, published_year, category, quantity, available)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', sample_books)
     
-    cursor.executemany('''
-        INSERT INTO users (name, email, phone, address, status, borrowed_books)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', sample_users)
+    if cursor.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 0:
+        # Insert dữ liệu mẫu - Users
+        sample_users = [
+            ('Nguyễn Văn A', 'nguyenvana@example.com', '0123456789', 'Hà Nội', 'active'),
+            ('Trần Thị B', 'tranthib@example.com', '0987654321', 'TP. HCM', 'active'),
+        ]
+        
+        cursor.executemany('''
+            INSERT INTO users (name, email, phone, address, status)
+            VALUES (?, ?, ?, ?, ?)
+        ''', sample_users)
     
     conn.commit()
     conn.close()
     
-    print('✓ Database initialized successfully!')
+    print('✓ Database seeded successfully!')
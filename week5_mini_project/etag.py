@@ -0,0 +1,88 @@
+from functools import wraps
+from flask import Response, jsonify, make_response, request
+from database import get_db
+from streaming import stream_mode
+
+# ==================== ETAG ====================
+
+def collection_etag(*tables):
+    """ETag của danh sách: version hiện tại của các bảng, ví dụ "books.42" """
+    placeholders = ', '.join('?' for _ in tables)
+    versions = dict(get_db().execute(
+        f'SELECT name, version FROM table_versions WHERE name IN ({placeholders})', tables).fetchall())
+    etag = '-'.join(f'{table}.{versions.get(table, 0)}' for table in tables)
+    # JSON và NDJSON là hai representation khác nhau của cùng URL
+    mode = stream_mode()
+    return f'{etag}-{mode}' if mode else etag
+
+
+def resource_etag(table, row):
+    """ETag của một dòng theo cột version, ví dụ "books-1.3" """
+    return f'{table}-{row["id"]}.{row["version"]}'
+
+
+def not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    response.vary.add('Accept')
+    return response
+
+
+def is_fresh(etag):
+    """If-None-Match khớp ETag (so sánh weak)"""
+    return request.if_none_match.contains_weak(etag)
+
+
+def precondition_response(etag=None):
+    response = jsonify({'success': False, 'message': 'Tài nguyên đã bị thay đổi (ETag không khớp)'})
+    response.status_code = 412
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def precondition_failed(etag):
+    """
+    If-Match có gửi nhưng không khớp ETag hiện tại -> response 412, ngược lại None.
+    ETag ở đây là weak nên If-Match cũng so sánh weak (version đổi là nội dung đổi).
+    """
+    if request.if_match and not request.if_match.contains_weak(etag):
+        return precondition_response(etag)
+    return None
+
+
+def expected_version(row):
+    """
+    Version dòng phải còn giữ nguyên lúc UPDATE/DELETE (... AND (? IS NULL OR version = ?)),
+    None nếu client không gửi If-Match hoặc gửi If-Match: *
+    """
+    if request.if_match and not request.if_match.star_tag:
+        return row['version']
+    return None
+
+
+def with_etag(response, etag):
+    response = make_response(response)
+    if response.status_code == 200:
+        response.set_etag(etag, weak=True)
+        response.vary.add('Accept')
+    return response
+
+
+def conditional(*tables):
+    """
+    Decorator cho GET danh sách: ETag lấy từ bộ đếm của bảng (1 query theo khóa chính),
+    client gửi If-None-Match khớp thì trả 304 mà không cần query/serialize dữ liệu.
+    Version được đọc trước dữ liệu nên ETag không bao giờ mới hơn nội dung trả về.
+    Phần tử của tables có thể là hàm trả về thêm các bảng theo request (vd. ?expand=).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = collection_etag(*(name for table in tables
+                                     for name in (table() if callable(table) else (table,))))
+            if is_fresh(etag):
+                return not_modified(etag)
+            return with_etag(view(*args, **kwargs), etag)
+        return wrapper
+    return decorator
@@ -0,0 +1,36 @@
+import json
+from flask import Response
+
+# Cache danh sách cột và biểu thức json_object(...) theo bảng (schema chỉ đổi khi migrate/restart)
+_columns_cache = {}
+_json_object_cache = {}
+
+
+def table_columns(conn, table):
+    """Tên các cột của bảng theo thứ tự trong schema"""
+    if table not in _columns_cache:
+        _columns_cache[table] = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    return _columns_cache[table]
+
+
+def json_object_sql(conn, table):
+    """
+    Biểu thức SQL json_object('id', id, 'title', title, ...) cho mọi cột của bảng,
+    để SQLite trả về sẵn chuỗi JSON của từng dòng (không cần sqlite3.Row -> dict -> json)
+    """
+    if table not in _json_object_cache:
+        pairs = ', '.join(f"'{col}', {col}" for col in table_columns(conn, table))
+        _json_object_cache[table] = f'json_object({pairs})'
+    return _json_object_cache[table]
+
+
+def json_list_response(rows_json, **extra):
+    """
+    Response {"success": true, "count": N, "data": [...], **extra} ghép từ các chuỗi
+    JSON đã encode sẵn, chỉ encode bằng Python phần extra nhỏ (cursor, ...)
+    """
+    body = [f'{{"success":true,"count":{len(rows_json)},"data":[', ','.join(rows_json), ']']
+    for key, value in extra.items():
+        body.append(f',"{key}":{json.dumps(value)}')
+    body.append('}')
+    return Response(''.join(body), mimetype='application/json')
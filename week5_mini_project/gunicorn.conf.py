@@ -0,0 +1,55 @@
+"""
+Cấu hình gunicorn: gunicorn -c gunicorn.conf.py app:app  (hoặc python serve.py)
+Mọi giá trị đều override được bằng biến môi trường.
+"""
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 3000)}"
+
+# Mỗi worker là một process có pool + cache riêng. SQLite chỉ có một writer nên
+# thêm process quá nhiều chỉ tăng tranh chấp lock: 2*CPU+1 nhưng tối đa 8
+workers = int(os.environ.get('WEB_CONCURRENCY', min(cpu_count * 2 + 1, 8)))
+
+# Thread trong worker chờ I/O SQLite (GIL được nhả), mỗi thread cần 1 connection
+# trong pool nên threads không được lớn hơn database.POOL_SIZE
+worker_class = 'gthread'
+threads = int(os.environ.get('THREADS', 4))
+
+# Load app (chạy migration, import route) một lần ở master rồi fork: worker khởi động
+# nhanh hơn và tốn ít RAM hơn. Master không mở connection nào trong pool trước khi fork.
+preload_app = os.environ.get('PRELOAD', '1') == '1'
+
+# Recycle worker sau N request (jitter để không restart cùng lúc) tránh rò rỉ bộ nhớ
+max_requests = int(os.environ.get('MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('MAX_REQUESTS_JITTER', 100))
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = os.environ.get('ACCESS_LOG', '-') or None  # ACCESS_LOG= (rỗng) để tắt
+errorlog = '-'
+
+
+def when_ready(server):
+    server.log.info('workers=%s threads=%s preload=%s max_requests=%s',
+                    workers, threads, preload_app, max_requests)
+
+
+def post_worker_init(worker):
+    # Thread không sống sót qua fork nên sweeper khởi động trong từng worker.
+    # Sweep là một UPDATE set-based idempotent, nhiều worker cùng chạy vẫn đúng.
+    from scheduler import start_overdue_sweeper
+    start_overdue_sweeper()
+
+
+def worker_exit(server, worker):
+    # Gọi sau khi worker đã xử lý xong request đang chạy (graceful shutdown / recycle)
+    from database import pool
+    from scheduler import stop_overdue_sweeper
+    stop_overdue_sweeper()
+    if not pool.drain(timeout=graceful_timeout):
+        server.log.warning('worker %s: còn connection chưa trả về pool khi thoát', worker.pid)
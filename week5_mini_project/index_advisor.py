@@ -0,0 +1,100 @@
+import logging
+import re
+import sqlite3
+import threading
+from flask import jsonify, has_request_context, request
+from database import add_query_hook
+
+logger = logging.getLogger('index_advisor')
+
+# Chỉ các câu lệnh đọc/ghi có query plan đáng xem
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH|UPDATE|DELETE|INSERT\s+INTO\s+\w+\s*(\([^)]*\))?\s*SELECT)',
+                         re.IGNORECASE)
+# "SCAN books" = đọc cả bảng; "SCAN books USING INDEX ..." / "VIRTUAL TABLE" thì không tính
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+class IndexAdvisor:
+    """
+    Dev mode: chạy EXPLAIN QUERY PLAN cho mỗi câu SQL (một lần cho mỗi câu khác nhau)
+    và log các full table scan / sort tạm kèm route đã gọi câu đó
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queries = {}
+
+    @staticmethod
+    def _route():
+        if has_request_context():
+            return f'{request.method} {request.url_rule.rule if request.url_rule else request.path}'
+        return '<background>'
+
+    @staticmethod
+    def _explain(conn, sql, params):
+        # sqlite3.Cursor gốc: không đi qua hook lần nữa
+        rows = sqlite3.Cursor(conn).execute('EXPLAIN QUERY PLAN ' + sql, params or ()).fetchall()
+        return [row[3] for row in rows]
+
+    def __call__(self, conn, sql, params, elapsed):
+        if params is None or not EXPLAINABLE.match(sql):
+            return
+
+        key = ' '.join(sql.split())
+        route = self._route()
+
+        with self._lock:
+            entry = self._queries.get(key)
+        if entry is None:
+            try:
+                plan = self._explain(conn, sql, params)
+            except sqlite3.Error:
+                return
+            issues = [f'full scan {m.group(1)}' for m in map(FULL_SCAN.match, plan) if m]
+            if TEMP_SORT in plan:
+                issues.append('temp b-tree sort')
+            entry = {'sql': key, 'plan': plan, 'issues': issues, 'routes': {}, 'count': 0}
+            with self._lock:
+                entry = self._queries.setdefault(key, entry)
+
+        with self._lock:
+            first_from_route = route not in entry['routes']
+            entry['routes'][route] = entry['routes'].get(route, 0) + 1
+            entry['count'] += 1
+
+        if entry['issues'] and first_from_route:
+            logger.warning('[index-advisor] %s: %s\n    %s\n    plan: %s',
+                           route, ', '.join(entry['issues']), key, ' | '.join(entry['plan']))
+
+    def report(self):
+        """Các câu SQL có vấn đề trước, nhiều lượt gọi trước"""
+        with self._lock:
+            entries = [dict(e, routes=dict(e['routes'])) for e in self._queries.values()]
+        return sorted(entries, key=lambda e: (not e['issues'], -e['count']))
+
+
+advisor = None
+
+
+def init_app(app):
+    """Bật index advisor (chỉ dùng khi dev) và endpoint /debug/index-advisor"""
+    global advisor
+    if advisor is not None:
+        return advisor
+
+    advisor = IndexAdvisor()
+    add_query_hook(advisor)
+    logging.basicConfig(level=logging.INFO)
+
+    @app.route('/debug/index-advisor')
+    def index_advisor_report():
+        """Báo cáo query plan của các câu SQL đã chạy"""
+        report = advisor.report()
+        return jsonify({
+            'success': True,
+            'issues': sum(1 for e in report if e['issues']),
+            'data': report
+        })
+
+    return advisor
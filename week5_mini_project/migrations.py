@@ -0,0 +1,247 @@
+import json
+from collections import Counter
+from datetime import datetime
+from models import Borrowing
+from search import rebuild_fts_index
+from stats import rebuild_stats, recreate_stats_triggers
+
+# ==================== MIGRATION STEPS ====================
+
+
+def drop_borrowed_books_column(conn):
+    """
+    Bỏ cột JSON users.borrowed_books (database tạo trước khi chuẩn hóa),
+    dữ liệu sách đang mượn lấy từ bảng borrowings. Sách có trong JSON mà không có
+    phiếu mượn tương ứng sẽ được tạo phiếu mượn (borrow_date = hôm nay).
+    """
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(users)')]
+    if 'borrowed_books' not in columns:
+        return
+
+    today = datetime.now().strftime('%Y-%m-%d')
+    due_date = Borrowing.calculate_due_date(today)
+
+    for user_id, borrowed_json in conn.execute('SELECT id, borrowed_books FROM users').fetchall():
+        try:
+            borrowed = Counter(json.loads(borrowed_json or '[]'))
+        except ValueError:
+            continue
+        for book_id, held in borrowed.items():
+            recorded = conn.execute(
+                "SELECT COUNT(*) FROM borrowings WHERE user_id = ? AND book_id = ? "
+                "AND status IN ('borrowed', 'overdue')", (user_id, book_id)).fetchone()[0]
+            for _ in range(held - recorded):
+                conn.execute('''
+                    INSERT INTO borrowings (user_id, book_id, borrow_date, due_date, status, fine)
+                    VALUES (?, ?, ?, ?, 'borrowed', 0)
+                ''', (user_id, book_id, today, due_date))
+
+    conn.execute('ALTER TABLE users DROP COLUMN borrowed_books')
+
+
+def create_fts_index(conn):
+    """Tạo books_fts + trigger và index lại sách đã có"""
+    rebuild_fts_index(conn, commit=False)
+
+
+def create_stats_tables(conn):
+    """Tạo bảng tổng hợp + trigger cho /api/stats và backfill từ borrowings đã có"""
+    rebuild_stats(conn, commit=False)
+
+
+# Bảng có version: mỗi dòng có cột version, mỗi bảng có bộ đếm trong table_versions
+VERSIONED_TABLES = ('books', 'users', 'borrowings')
+
+
+def _row_version_triggers(table):
+    # Chỉ tự tăng khi câu UPDATE không tự đặt version. UPDATE lồng bên trong không
+    # kích hoạt lại trigger (recursive_triggers mặc định tắt) và không đụng
+    # title/author/category nên trigger FTS của books không chạy lại.
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_version_insert AFTER INSERT ON {table} BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_version_update AFTER UPDATE ON {table}
+        WHEN NEW.version = OLD.version BEGIN
+            UPDATE {table} SET version = OLD.version + 1 WHERE id = NEW.id;
+            UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_version_delete AFTER DELETE ON {table} BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+        END
+        ''',
+    ]
+
+
+VERSION_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS table_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''',
+    *[f"INSERT OR IGNORE INTO table_versions (name, version) VALUES ('{table}', 1)"
+      for table in VERSIONED_TABLES],
+    *[f'ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1'
+      for table in VERSIONED_TABLES],
+    *[trigger for table in VERSIONED_TABLES for trigger in _row_version_triggers(table)],
+    # users có borrowed_books lấy từ borrowings: mượn/trả/xóa phiếu cũng đổi version user
+    # (borrowed -> overdue không đổi borrowed_books nên không tính)
+    '''
+    CREATE TRIGGER IF NOT EXISTS borrowings_user_version_insert AFTER INSERT ON borrowings BEGIN
+        UPDATE users SET version = version + 1 WHERE id = NEW.user_id;
+        UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS borrowings_user_version_update AFTER UPDATE OF status ON borrowings
+    WHEN (OLD.status = 'returned') != (NEW.status = 'returned') BEGIN
+        UPDATE users SET version = version + 1 WHERE id = NEW.user_id;
+        UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS borrowings_user_version_delete AFTER DELETE ON borrowings BEGIN
+        UPDATE users SET version = version + 1 WHERE id = OLD.user_id;
+        UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+    END
+    ''',
+]
+
+
+# Không cho quantity/available xuống dưới số sách đang được mượn (update_book, bulk upsert):
+# câu UPDATE vi phạm bị abort với sqlite3.IntegrityError
+AVAILABLE_GUARD_SCHEMA = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS books_available_guard BEFORE UPDATE OF quantity, available ON books
+    WHEN NEW.available < 0 BEGIN
+        SELECT RAISE(ABORT, 'Số lượng nhỏ hơn số sách đang được mượn');
+    END
+    ''',
+]
+
+
+# Mỗi migration: (version, mô tả, list các bước SQL hoặc hàm nhận conn).
+# Chỉ thêm migration mới vào cuối, không sửa migration đã phát hành.
+MIGRATIONS = [
+    (1, 'create books, users, borrowings', [
+        '''
+        CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            isbn TEXT UNIQUE NOT NULL,
+            published_year INTEGER,
+            category TEXT DEFAULT 'Uncategorized',
+            quantity INTEGER DEFAULT 1,
+            available INTEGER DEFAULT 1
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            phone TEXT NOT NULL,
+            address TEXT,
+            status TEXT DEFAULT 'active'
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS borrowings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT,
+            status TEXT DEFAULT 'borrowed',
+            fine REAL DEFAULT 0
+        )
+        ''',
+    ]),
+    (2, 'drop users.borrowed_books JSON column', [drop_borrowed_books_column]),
+    (3, 'books full-text index', [create_fts_index]),
+    (4, 'secondary indexes', [
+        # Keyset pagination / filter theo category
+        'CREATE INDEX IF NOT EXISTS idx_books_category_year_id ON books(category, published_year, id)',
+        # Sách đang mượn theo user / theo sách
+        'CREATE INDEX IF NOT EXISTS idx_borrowings_user_status ON borrowings(user_id, status)',
+        'CREATE INDEX IF NOT EXISTS idx_borrowings_book_status ON borrowings(book_id, status)',
+        # Overdue sweep và /api/borrowings/overdue
+        'CREATE INDEX IF NOT EXISTS idx_borrowings_status_due ON borrowings(status, due_date)',
+        # GET /api/users?status=
+        'CREATE INDEX IF NOT EXISTS idx_users_status ON users(status)',
+    ]),
+    (5, 'row versions and table change counters (ETag)', VERSION_SCHEMA),
+    (6, 'borrowing statistics summary tables', [create_stats_tables]),
+    (7, 'books.available never below zero', AVAILABLE_GUARD_SCHEMA),
+    (8, 'statistics triggers use local date', [recreate_stats_triggers]),
+]
+
+# ==================== RUNNER ====================
+
+
+def current_version(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def migrate(conn):
+    """
+    Áp dụng các migration chưa chạy, mỗi migration một transaction.
+    Returns: list version vừa áp dụng
+    """
+    # Fast path khi khởi động: PRAGMA user_version lưu version mới nhất đã áp dụng,
+    # đọc 1 giá trị trong header file, không cần ghi gì
+    if conn.execute('PRAGMA user_version').fetchone()[0] >= LATEST_VERSION:
+        return []
+
+    applied = []
+    version = current_version(conn)
+    conn.commit()
+
+    for target, description, steps in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        # Process khác có thể vừa chạy xong migration này trong lúc chờ lock
+        if conn.execute('SELECT 1 FROM schema_version WHERE version = ?', (target,)).fetchone():
+            conn.rollback()
+            continue
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute('INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                         (target, description, datetime.now().isoformat(timespec='seconds')))
+            conn.execute(f'PRAGMA user_version = {int(target)}')
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        applied.append(target)
+        print(f'✓ Migration {target}: {description}')
+
+    # Database migrate trước khi có user_version: ghi lại để lần sau đi fast path
+    if not applied and version >= LATEST_VERSION:
+        conn.execute(f'PRAGMA user_version = {int(version)}')
+        conn.commit()
+
+    return applied
@@ -1,6 +1,32 @@
 from datetime import datetime, timedelta
-import re
-import json
+from validation import Validator, present, required, pattern, year
+
+# Số sách tối đa một user được mượn cùng lúc
+MAX_BORROWED_BOOKS = 5
+
+# ==================== SCHEMAS ====================
+# Rule khai báo một lần khi import module
+
+BOOK_VALIDATOR = Validator(
+    required('title', 'Title là bắt buộc'),
+    required('author', 'Author là bắt buộc'),
+    required('isbn', 'ISBN là bắt buộc'),
+    pattern('isbn', r'^[0-9-]+$', 'ISBN chỉ chứa số và dấu gạch ngang'),
+    year('published_year', 'Năm xuất bản phải là số', 'Năm xuất bản không hợp lệ'),
+)
+
+USER_VALIDATOR = Validator(
+    required('name', 'Name là bắt buộc'),
+    required('email', 'Email là bắt buộc'),
+    required('phone', 'Phone là bắt buộc'),
+    pattern('email', r'^[^\s@]+@[^\s@]+\.[^\s@]+$', 'Email không hợp lệ'),
+    pattern('phone', r'^[0-9]{10,11}$', 'Phone phải có 10-11 chữ số', ignore_chars=' -'),
+)
+
+BORROWING_VALIDATOR = Validator(
+    present('user_id', 'User ID là bắt buộc'),
+    present('book_id', 'Book ID là bắt buộc'),
+)
 
 
 class Book:
@@ -12,31 +38,7 @@ class Book:
         Validate book data
         Returns: (is_valid: bool, errors: list)
         """
-        errors = []
-        
-        if not data.get('title') or not data['title'].strip():
-            errors.append('Title là bắt buộc')
-        
-        if not data.get('author') or not data['author'].strip():
-            errors.append('Author là bắt buộc')
-        
-        if not data.get('isbn') or not data['isbn'].strip():
-            errors.append('ISBN là bắt buộc')
-        
-        # Validate ISBN format
-        if data.get('isbn') and not re.match(r'^[0-9-]+$', data['isbn']):
-            errors.append('ISBN chỉ chứa số và dấu gạch ngang')
-        
-        # Validate year
-        if 'published_year' in data and data['published_year']:
-            try:
-                year = int(data['published_year'])
-                if year < 1000 or year > datetime.now().year:
-                    errors.append(f'Năm xuất bản không hợp lệ')
-            except:
-                errors.append('Năm xuất bản phải là số')
-        
-        return (len(errors) == 0, errors)
+        return BOOK_VALIDATOR(data)
     
     @staticmethod
     def create(data):
@@ -76,27 +78,7 @@ class User:
         Validate user data
         Returns: (is_valid: bool, errors: list)
         """
-        errors = []
-        
-        if not data.get('name') or not data['name'].strip():
-            errors.append('Name là bắt buộc')
-        
-        if not data.get('email') or not data['email'].strip():
-            errors.append('Email là bắt buộc')
-        
-        if not data.get('phone') or not data['phone'].strip():
-            errors.append('Phone là bắt buộc')
-        
-        # Validate email
-        if data.get('email') and not re.match(r'^[^\s@]+@[^\s@]+\.[^\s@]+$', data['email']):
-            errors.append('Email không hợp lệ')
-        
-        # Validate phone
-        phone = data.get('phone', '').replace(' ', '').replace('-', '')
-        if phone and not re.match(r'^[0-9]{10,11}$', phone):
-            errors.append('Phone phải có 10-11 chữ số')
-        
-        return (len(errors) == 0, errors)
+        return USER_VALIDATOR(data)
     
     @staticmethod
     def create(data):
@@ -106,15 +88,13 @@ class User:
             'email': data['email'],
             'phone': data['phone'],
             'address': data.get('address', ''),
-            'status': data.get('status', 'active'),
-            'borrowed_books': '[]'
+            'status': data.get('status', 'active')
         }
     
     @staticmethod
-    def can_borrow(user):
-        """Kiểm tra user có thể mượn sách không"""
-        borrowed = json.loads(user.get('borrowed_books', '[]'))
-        return user.get('status') == 'active' and len(borrowed) < 5
+    def can_borrow(user, borrowed_count):
+        """Kiểm tra user có thể mượn sách không (borrowed_count: số sách đang mượn)"""
+        return user.get('status') == 'active' and borrowed_count < MAX_BORROWED_BOOKS
     
     @staticmethod
     def is_active(user):
@@ -122,10 +102,9 @@ class User:
         return user.get('status') == 'active'
     
     @staticmethod
-    def has_borrowed_books(user):
+    def has_borrowed_books(borrowed_count):
         """Kiểm tra user có sách đang mượn không"""
-        borrowed = json.loads(user.get('borrowed_books', '[]'))
-        return len(borrowed) > 0
+        return borrowed_count > 0
 
 
 class Borrowing:
@@ -137,15 +116,7 @@ class Borrowing:
         Validate borrowing data
         Returns: (is_valid: bool, errors: list)
         """
-        errors = []
-        
-        if not data.get('user_id'):
-            errors.append('User ID là bắt buộc')
-        
-        if not data.get('book_id'):
-            errors.append('Book ID là bắt buộc')
-        
-        return (len(errors) == 0, errors)
+        return BORROWING_VALIDATOR(data)
     
     @staticmethod
     def create(data):
@@ -0,0 +1,207 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+
+# Secret ký cursor - đổi trong production
+CURSOR_SECRET = os.environ.get('CURSOR_SECRET', 'your-cursor-secret-change-this-in-production')
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+
+class CursorError(ValueError):
+    """Cursor không hợp lệ (sai chữ ký, sai định dạng, khác sort)"""
+
+
+def parse_limit(value, default=DEFAULT_LIMIT):
+    """Đọc limit từ query string, giới hạn trong [1, MAX_LIMIT]"""
+    try:
+        limit = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        raise CursorError('Limit phải là số')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def parse_sort(sort_param, allowed, default):
+    """
+    Đọc sort dạng "category,-published_year" (dấu - là DESC)
+    Returns: list[(column, 'ASC'|'DESC')]
+    """
+    if not sort_param:
+        return list(default)
+
+    sort = []
+    for item in sort_param.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        direction = 'DESC' if item.startswith('-') else 'ASC'
+        column = item.lstrip('+-')
+        if column not in allowed:
+            raise CursorError(f'Không thể sắp xếp theo "{column}"')
+        sort.append((column, direction))
+    return sort or list(default)
+
+
+class KeysetPaginator:
+    """
+    Keyset (seek) pagination cho sort key nhiều cột, ví dụ (category, published_year, id).
+    Trang tiếp theo được lấy bằng điều kiện WHERE trên key của dòng cuối,
+    nên chi phí không phụ thuộc vào việc đang ở trang thứ mấy (khác LIMIT/OFFSET).
+    """
+
+    def __init__(self, sort, unique_key='id', nullable=(), secret=CURSOR_SECRET):
+        sort = [(col, direction.upper()) for col, direction in sort]
+        # Luôn kết thúc bằng cột unique để thứ tự là toàn phần
+        if unique_key not in [col for col, _ in sort]:
+            sort.append((unique_key, 'ASC'))
+        self.sort = sort
+        self.nullable = set(nullable)
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.signature = ','.join(f'{col} {direction}' for col, direction in sort)
+
+    # ==================== CURSOR ====================
+
+    def _sign(self, payload):
+        return hmac.new(self.secret, payload, hashlib.sha256).digest()[:16]
+
+    def encode_cursor(self, row, direction):
+        values = [row[col] for col, _ in self.sort]
+        payload = json.dumps({'v': values, 'd': direction, 's': self.signature},
+                             separators=(',', ':'), ensure_ascii=False).encode()
+        token = base64.urlsafe_b64encode(payload + self._sign(payload))
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, cursor_str):
+        try:
+            raw = base64.urlsafe_b64decode(cursor_str + '=' * (-len(cursor_str) % 4))
+        except (ValueError, TypeError):
+            raise CursorError('Cursor không hợp lệ')
+
+        payload, signature = raw[:-16], raw[-16:]
+        if len(raw) <= 16 or not hmac.compare_digest(signature, self._sign(payload)):
+            raise CursorError('Cursor không hợp lệ')
+
+        data = json.loads(payload)
+        if data.get('s') != self.signature or data.get('d') not in ('next', 'prev'):
+            raise CursorError('Cursor không khớp với kiểu sắp xếp hiện tại')
+        if len(data.get('v', [])) != len(self.sort):
+            raise CursorError('Cursor không hợp lệ')
+        return data
+
+    # ==================== SQL ====================
+
+    def _seek_condition(self, sort, values):
+        """
+        Điều kiện "đứng sau key" theo thứ tự sort, có xử lý NULL
+        (SQLite xếp NULL đầu tiên khi ASC, cuối cùng khi DESC)
+        """
+        terms = []
+        params = []
+        equal_terms = []
+        equal_params = []
+
+        for (col, direction), value in zip(sort, values):
+            if direction == 'ASC':
+                if value is None:
+                    after, after_params = f'{col} IS NOT NULL', []
+                else:
+                    after, after_params = f'{col} > ?', [value]
+            else:
+                if value is None:
+                    after, after_params = None, []
+                elif col in self.nullable:
+                    after, after_params = f'({col} < ? OR {col} IS NULL)', [value]
+                else:
+                    after, after_params = f'{col} < ?', [value]
+
+            if after:
+                terms.append(' AND '.join(equal_terms + [after]))
+                params.extend(equal_params + after_params)
+
+            equal_terms.append(f'{col} IS ?')
+            equal_params.append(value)
+
+        if not terms:
+            return '0', []
+
+        condition = '(' + ' OR '.join(f'({t})' for t in terms) + ')'
+
+        # Điều kiện trên cột đầu tiên giúp SQLite seek thẳng vào index
+        col, direction = sort[0]
+        value = values[0]
+        if value is not None and (direction == 'ASC' or col not in self.nullable):
+            op = '>=' if direction == 'ASC' else '<='
+            condition = f'{col} {op} ? AND {condition}'
+            params.insert(0, value)
+
+        return condition, params
+
+    @staticmethod
+    def _order_by(sort):
+        return ', '.join(f'{col} {direction}' for col, direction in sort)
+
+    @staticmethod
+    def _reverse(sort):
+        return [(col, 'DESC' if direction == 'ASC' else 'ASC') for col, direction in sort]
+
+    def page_query(self, base_query, params=(), cursor=None, limit=DEFAULT_LIMIT, json_select=None):
+        """
+        Câu SQL cho một trang (tách khỏi paginate() để dùng được với driver async).
+        Returns: (query, params, state) - state truyền lại cho build_page()
+        """
+        direction = 'next'
+        sort = self.sort
+        where, where_params = '1', []
+
+        if cursor:
+            cursor_data = self.decode_cursor(cursor)
+            direction = cursor_data['d']
+            if direction == 'prev':
+                sort = self._reverse(self.sort)
+            where, where_params = self._seek_condition(sort, cursor_data['v'])
+
+        if json_select:
+            columns = f'{json_select} AS _json, ' + ', '.join(col for col, _ in self.sort)
+        else:
+            columns = '*'
+        query = (f'SELECT {columns} FROM ({base_query}) WHERE {where} '
+                 f'ORDER BY {self._order_by(sort)} LIMIT ?')
+        state = {'direction': direction, 'cursor': cursor, 'limit': limit, 'json': bool(json_select)}
+        return query, [*params, *where_params, limit + 1], state
+
+    def build_page(self, rows, state):
+        """Ghép kết quả của page_query() thành {'data', 'next_cursor', 'prev_cursor'}"""
+        direction, cursor, limit = state['direction'], state['cursor'], state['limit']
+
+        has_more = len(rows) > limit
+        rows = list(rows[:limit])
+        if direction == 'prev':
+            rows.reverse()
+
+        next_cursor = None
+        prev_cursor = None
+        if rows:
+            if direction == 'prev' or has_more:
+                next_cursor = self.encode_cursor(rows[-1], 'next')
+            if (direction == 'next' and cursor) or (direction == 'prev' and has_more):
+                prev_cursor = self.encode_cursor(rows[0], 'prev')
+
+        if state['json']:
+            data = [row[0] for row in rows]
+        else:
+            data = [dict(row) for row in rows]
+        return {'data': data, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor}
+
+    def paginate(self, conn, base_query, params=(), cursor=None, limit=DEFAULT_LIMIT,
+                 json_select=None):
+        """
+        Chạy base_query (SELECT không có ORDER BY/LIMIT) theo trang.
+        json_select: biểu thức json_object(...) - nếu có, data là list chuỗi JSON
+        SQLite đã encode sẵn thay vì list dict.
+        Returns: {'data': [...], 'next_cursor': str|None, 'prev_cursor': str|None}
+        """
+        query, query_params, state = self.page_query(base_query, params, cursor, limit, json_select)
+        return self.build_page(conn.execute(query, query_params).fetchall(), state)
@@ -0,0 +1,73 @@
+import os
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context
+
+# Thư mục lưu file .prof (cProfile) của từng request khi bật PROFILE_DIR
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+
+enabled = False
+
+
+def record(name, seconds):
+    """Cộng thời gian vào segment name của request hiện tại"""
+    if enabled and has_request_context():
+        timings = g.setdefault('timings', {})
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def segment(name):
+    """
+    Đo một đoạn code trong request:
+        with profiler.segment('serialize'):
+            ...
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+def _db_hook(conn, sql, params, elapsed):
+    record('db', elapsed)
+
+
+def server_timing(timings, total):
+    """Header Server-Timing: "db;dur=1.20, total;dur=3.45" (ms)"""
+    parts = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in timings.items()]
+    parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def init_app(app, profile_dir=PROFILE_DIR):
+    """
+    Bật đo thời gian theo request (header Server-Timing), cần gọi trước khi pool mở
+    connection đầu tiên để đo được thời gian SQL. profile_dir: ghi thêm cProfile mỗi request.
+    """
+    # Import ở đây vì models -> validation -> profiler được import trước database
+    from database import add_query_hook
+
+    global enabled
+    if enabled:
+        return
+    enabled = True
+    add_query_hook(_db_hook)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def add_server_timing(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            response.headers.add('Server-Timing', server_timing(
+                g.pop('timings', {}), time.perf_counter() - started))
+        return response
+
+    if profile_dir:
+        from werkzeug.middleware.profiler import ProfilerMiddleware
+        os.makedirs(profile_dir, exist_ok=True)
+        app.wsgi_app = ProfilerMiddleware(app.wsgi_app, profile_dir=profile_dir, restrictions=[30])
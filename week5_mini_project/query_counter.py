@@ -0,0 +1,191 @@
+"""
+Flask extension đếm số query SQLite trong mỗi request và phát hiện N+1
+(cùng một câu lệnh, chỉ khác tham số, chạy lặp lại nhiều lần).
+
+    query_counter = QueryCounter(app, budget=20)
+
+    # Connection sqlite3 thường: dùng factory của module
+    conn = sqlite3.connect(DB_FILE, factory=CountingConnection)
+    # week5: đăng ký làm query hook của pool
+    add_query_hook(query_counter.hook)
+
+Response có header X-Query-Count và Server-Timing (sql;dur=...). Vượt budget hoặc
+có câu lệnh lặp >= repeat_threshold lần thì log cảnh báo; khi app.testing (hoặc
+QUERY_COUNTER_RAISE=True) thì raise QueryBudgetExceeded để test fail.
+
+Trong test:
+    with assert_max_queries(2):
+        client.get('/authors/efficient')
+"""
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+
+REPEAT_THRESHOLD = 3
+
+_local = threading.local()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAM_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Endpoint chạy nhiều query hơn budget, hoặc có dấu hiệu N+1"""
+
+
+def statement_shape(sql):
+    """Chuẩn hóa câu lệnh: literal -> ?, danh sách (?, ?, ...) -> (?), gộp khoảng trắng"""
+    shape = _NUMBER.sub('?', _STRING.sub('?', sql))
+    shape = _PARAM_LIST.sub('(?)', shape)
+    return _SPACES.sub(' ', shape).strip()
+
+
+class QueryStats:
+    """Số query, tổng thời gian và số lần chạy của từng shape trong một request"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def add(self, sql, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.shapes[statement_shape(sql)] += 1
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        """[(shape, số lần)] các câu lệnh chạy lặp >= threshold lần"""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+def record(sql, seconds):
+    """Ghi một query vào request hiện tại và các khối assert_max_queries đang mở"""
+    for stats in getattr(_local, 'blocks', ()):
+        stats.add(sql, seconds)
+    if has_request_context():
+        stats = g.get('_query_stats')
+        if stats is not None:
+            stats.add(sql, seconds)
+
+
+def query_count():
+    """Số query đã chạy trong request hiện tại"""
+    stats = g.get('_query_stats') if has_request_context() else None
+    return stats.count if stats else 0
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """Raise QueryBudgetExceeded nếu khối code chạy nhiều hơn limit query"""
+    stats = QueryStats()
+    blocks = _local.__dict__.setdefault('blocks', [])
+    blocks.append(stats)
+    try:
+        yield stats
+    finally:
+        blocks.remove(stats)
+    if stats.count > limit:
+        raise QueryBudgetExceeded(f'{stats.count} queries (budget {limit}): {dict(stats.shapes)}')
+
+
+def query_budget(limit):
+    """Decorator đặt budget riêng cho một view, ghi đè QUERY_BUDGET của app"""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+# ==================== CONNECTION ====================
+
+class CountingCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record(sql, time.perf_counter() - started)
+
+
+class CountingConnection(sqlite3.Connection):
+    """sqlite3.connect(..., factory=CountingConnection): mọi câu lệnh đều được đếm"""
+
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# ==================== EXTENSION ====================
+
+class QueryCounter:
+    def __init__(self, app=None, budget=None, repeat_threshold=REPEAT_THRESHOLD):
+        self.budget = budget
+        self.repeat_threshold = repeat_threshold
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_BUDGET', self.budget)
+        app.config.setdefault('QUERY_REPEAT_THRESHOLD', self.repeat_threshold)
+        app.config.setdefault('QUERY_COUNTER_RAISE', None)  # None: raise khi app.testing
+        app.extensions['query_counter'] = self
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    @staticmethod
+    def hook(conn, sql, params, elapsed):
+        """Dạng hook(conn, sql, params, elapsed) của database.add_query_hook"""
+        record(sql, elapsed)
+
+    @staticmethod
+    def _start():
+        g._query_stats = QueryStats()
+
+    @staticmethod
+    def _budget():
+        view = current_app.view_functions.get(request.endpoint)
+        return getattr(view, 'query_budget', None) or current_app.config['QUERY_BUDGET']
+
+    def _finish(self, response):
+        stats = g.pop('_query_stats', None)
+        if stats is None:
+            return response
+
+        response.headers['X-Query-Count'] = str(stats.count)
+        response.headers.add('Server-Timing',
+                             f'sql;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries"')
+
+        problems = []
+        budget = self._budget()
+        if budget is not None and stats.count > budget:
+            problems.append(f'{stats.count} queries, budget {budget}')
+        for shape, n in stats.repeated(current_app.config['QUERY_REPEAT_THRESHOLD']):
+            problems.append(f'N+1? {n}x {shape}')
+
+        if problems:
+            message = f'{request.method} {request.path}: ' + '; '.join(problems)
+            should_raise = current_app.config['QUERY_COUNTER_RAISE']
+            if should_raise is None:
+                should_raise = current_app.testing
+            if should_raise:
+                raise QueryBudgetExceeded(message)
+            current_app.logger.warning(message)
+        return response
@@ -1,5 +1,6 @@
-from .book_routes import book_bp
-from .user_routes import user_bp
+from .book_routes import book_bp, bulk_import_books
+from .user_routes import user_bp, bulk_import_users
 from .borrowing_routes import borrowing_bp
+from .stats_routes import stats_bp
 
-__all__ = ['book_bp', 'user_bp', 'borrowing_bp']
+__all__ = ['book_bp', 'user_bp', 'borrowing_bp', 'stats_bp', 'bulk_import_books', 'bulk_import_users']
@@ -1,13 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from database import get_db
-from models import Book
-import json
-import base64
+from models import Book, BOOK_VALIDATOR
+from pagination import KeysetPaginator, CursorError, parse_limit, parse_sort
+from search import build_match_query, BM25_WEIGHTS
+from bulk import bulk_upsert, read_records, UnsupportedFormat
+from fastjson import json_object_sql, json_list_response, table_columns
+from streaming import ndjson_stream, csv_stream, stream_mode, stream_response
+from cache import book_cache
+from etag import (conditional, resource_etag, is_fresh, not_modified, precondition_failed,
+                  precondition_response, expected_version, with_etag)
 
 book_bp = Blueprint('books', __name__)
 
 # page-based pagination : localhost:3000/api/books?page=1&limit=5
 @book_bp.route('', methods=['GET'])
+@conditional('books')
 def get_books():
     """Lấy danh sách sách với filter và pagination"""
     # category = request.args.get('category')
@@ -17,7 +24,8 @@ def get_books():
     conn = get_db()
     cursor = conn.cursor()
     
-    query = 'SELECT * FROM books'
+    # SQLite encode sẵn mỗi dòng thành JSON (xem fastjson.py)
+    query = f'SELECT {json_object_sql(conn, "books")} FROM books'
     params = []
     
     # if category:
@@ -30,13 +38,13 @@ def get_books():
     params.extend([limit, offset]) # Thêm limit và offset vào list params
     
     cursor.execute(query, params)
-    books = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    books = [row[0] for row in cursor.fetchall()]
     
-    return jsonify({'success': True, 'count': len(books), 'data': books})
+    return json_list_response(books)
 
 # offset-limit pagination : localhost:3000/api/books/v2?category=Fiction&offset=0&limit=5
 @book_bp.route('v2', methods=['GET'])
+@conditional('books')
 def get_books_v2():
     """Lấy danh sách sách với filter và offset-limit pagination"""
     category = request.args.get('category')
@@ -58,104 +66,62 @@ def get_books_v2():
     
     cursor.execute(query, params)
     books = [dict(row) for row in cursor.fetchall()]
-    conn.close()
     
     return jsonify({'success': True, 'count': len(books), 'data': books})
 
-def encode_cursor(data):
-    json_str = json.dumps(data)
-    return base64.b64encode(json_str.encode()).decode()
-
-def decode_cursor(cursor_str):
-    json_str = base64.b64decode(cursor_str.encode()).decode()
-    return json.loads(json_str)
+BOOK_SORT_COLUMNS = ('id', 'title', 'author', 'category', 'published_year')
 
-#cursor based pagination : localhost:3000/api/books/v3?limit=5&cursor=5
+#cursor based pagination : localhost:3000/api/books/v3?limit=5&sort=category,-published_year&cursor=...
 @book_bp.route('v3', methods=['GET'])
+@conditional('books')
 def get_books_v3():
-    """Cursor pagination với Base64 encoding"""
-    
-    limit = int(request.args.get('limit', 10))
-    cursor_param = request.args.get('cursor')
+    """Keyset pagination với cursor đã ký, hỗ trợ sort nhiều cột"""
+    category = request.args.get('category')
 
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    query = 'SELECT * FROM books WHERE 1=1'
-    params = []
-    
-    cursor_data = None
-    # Decode cursor
-    if cursor_param:
-        cursor_data = decode_cursor(cursor_param)
-        if cursor_data['direction'] == 'next':
-            if cursor_data and 'last_id' in cursor_data:
-                query += ' AND id > ?'
-                params.append(cursor_data['last_id'])
-            query += ' ORDER BY id ASC LIMIT ?'
-        elif cursor_data['direction'] == 'prev':
-            if cursor_data and 'first_id' in cursor_data:
-                query += ' AND id < ?'
-                params.append(cursor_data['first_id'])
-            query += ' ORDER BY id DESC LIMIT ?'
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        sort = parse_sort(request.args.get('sort'), BOOK_SORT_COLUMNS, [('id', 'ASC')])
+        paginator = KeysetPaginator(sort, nullable=('published_year', 'category'))
 
-    else:
-        # Lần đầu lấy dữ liệu
-        query += ' ORDER BY id ASC LIMIT ?'
-    
-    params.append(limit)
-    
-    cursor.execute(query, params)
-    books = [dict(row) for row in cursor.fetchall()]
+        query = 'SELECT * FROM books'
+        params = []
+        if category:
+            query += ' WHERE category = ?'
+            params.append(category)
 
-    if cursor_data:
-        if cursor_data['direction'] == 'prev':
-            books.reverse()
-    
-    # Tạo cursors theo logic chuẩn
-    next_cursor = None
-    prev_cursor = None
-    
-    if books:
-        first_book = books[0]
-        last_book = books[-1]
-        
-        if len(books) == limit:
-            next_cursor = encode_cursor({
-                'last_id': last_book['id'],
-                'direction': 'next'
-            })
+        page = paginator.paginate(get_db(), query, params,
+                                  cursor=request.args.get('cursor'), limit=limit)
+    except CursorError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
 
-        if first_book['id'] > 1:
-            prev_cursor = encode_cursor({
-                'first_id': first_book['id'],
-                'direction': 'prev'
-            })
-    
-    conn.close()
-    
     return jsonify({
         'success': True,
-        'count': len(books),
-        'data': books,
-        'next_cursor': next_cursor,  # Trả về next cursor đã mã hóa
-        'prev_cursor': prev_cursor  # Trả về prev cursor đã mã hóa
+        'count': len(page['data']),
+        'data': page['data'],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor']
     })
 
 
 @book_bp.route('/<int:book_id>', methods=['GET'])
 def get_book(book_id):
-    """Lấy sách theo ID"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM books WHERE id = ?', (book_id,))
-    book = cursor.fetchone()
-    conn.close()
+    """Lấy sách theo ID (qua cache)"""
+    book = book_cache.get(book_id, load_book)
     
     if not book:
         return jsonify({'success': False, 'message': 'Không tìm thấy sách'}), 404
     
-    return jsonify({'success': True, 'data': dict(book)})
+    # Client đã có bản mới nhất: trả 304, không cần serialize
+    etag = resource_etag('books', book)
+    if is_fresh(etag):
+        return not_modified(etag)
+    
+    return with_etag(jsonify({'success': True, 'data': book}), etag)
+
+def load_book(book_id):
+    """Đọc sách từ database cho book_cache"""
+    book = get_db().execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+    return dict(book) if book else None
 
 @book_bp.route('', methods=['POST'])
 def create_book():
@@ -172,7 +138,6 @@ def create_book():
     
     # Kiểm tra ISBN trùng
     if cursor.execute('SELECT id FROM books WHERE isbn = ?', (data['isbn'],)).fetchone():
-        conn.close()
         return jsonify({'success': False, 'message': 'ISBN đã tồn tại'}), 400
     
     # Tạo book từ model
@@ -187,10 +152,10 @@ def create_book():
     
     conn.commit()
     book_id = cursor.lastrowid
+    book_cache.invalidate(book_id)
     
     cursor.execute('SELECT * FROM books WHERE id = ?', (book_id,))
     new_book = dict(cursor.fetchone())
-    conn.close()
     
     return jsonify({'success': True, 'message': 'Tạo sách thành công', 'data': new_book}), 201
 
@@ -210,30 +175,47 @@ def update_book(book_id):
     cursor.execute('SELECT * FROM books WHERE id = ?', (book_id,))
     book = cursor.fetchone()
     if not book:
-        conn.close()
         return jsonify({'success': False, 'message': 'Không tìm thấy sách'}), 404
     
+    # If-Match: chỉ cập nhật khi client đang sửa đúng version hiện tại
+    failed = precondition_failed(resource_etag('books', book))
+    if failed:
+        return failed
+    
     # Tính số sách đang được mượn
     book_dict = dict(book)
     borrowed = Book.get_borrowed_count(book_dict)
+    try:
+        quantity = int(data.get('quantity', book_dict['quantity']))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'errors': ['Quantity phải là số']}), 400
+    if quantity < borrowed:
+        return jsonify({'success': False,
+                        'errors': [f'Quantity không được nhỏ hơn số sách đang được mượn ({borrowed})']}), 400
+    version = expected_version(book_dict)
     
     cursor.execute('''
         UPDATE books 
         SET title=?, author=?, isbn=?, published_year=?, category=?, quantity=?, available=?
-        WHERE id = ?
+        WHERE id = ? AND (? IS NULL OR version = ?)
     ''', (data['title'], data['author'], data['isbn'],
           data.get('published_year'), data.get('category'),
-          data.get('quantity', book_dict['quantity']),
-          data.get('quantity', book_dict['quantity']) - borrowed,
-          book_id))
+          quantity, quantity - borrowed,
+          book_id, version, version))
+    updated = cursor.rowcount
     
     conn.commit()
+    book_cache.invalidate(book_id)
     
     cursor.execute('SELECT * FROM books WHERE id = ?', (book_id,))
     updated_book = dict(cursor.fetchone())
-    conn.close()
     
-    return jsonify({'success': True, 'message': 'Cập nhật thành công', 'data': updated_book})
+    # Có request khác sửa sách giữa lúc đọc và ghi
+    if not updated:
+        return precondition_response(resource_etag('books', updated_book))
+    
+    return with_etag(jsonify({'success': True, 'message': 'Cập nhật thành công', 'data': updated_book}),
+                     resource_etag('books', updated_book))
 
 # http://localhost:3000/api/books/1
 @book_bp.route('/<int:book_id>', methods=['DELETE'])
@@ -246,61 +228,146 @@ def delete_book(book_id):
     book = cursor.fetchone()
     
     if not book:
-        conn.close()
         return jsonify({'success': False, 'message': 'Không tìm thấy sách'}), 404
     
+    failed = precondition_failed(resource_etag('books', book))
+    if failed:
+        return failed
+    
     # Kiểm tra bằng Book model
     if Book.has_borrowed_books(dict(book)):
-        conn.close()
         return jsonify({'success': False, 'message': 'Không thể xóa sách đang được mượn'}), 400
     
-    cursor.execute('DELETE FROM books WHERE id = ?', (book_id,))
+    version = expected_version(book)
+    cursor.execute('DELETE FROM books WHERE id = ? AND (? IS NULL OR version = ?)',
+                   (book_id, version, version))
+    deleted = cursor.rowcount
     conn.commit()
-    conn.close()
+    book_cache.invalidate(book_id)
+    
+    if not deleted:
+        return precondition_response()
     
     return jsonify({'success': True, 'message': 'Xóa sách thành công'})
 
 @book_bp.route('/search', methods=['GET'])
+@conditional('books')
 def search_books():
-    """Tìm kiếm sách nâng cao"""
+    """Tìm kiếm sách nâng cao (full-text search với FTS5, xếp hạng theo bm25)"""
     q = request.args.get('q')
     title = request.args.get('title')
     author = request.args.get('author')
     category = request.args.get('category')
     
     conn = get_db()
-    cursor = conn.cursor()
-    
-    query = 'SELECT * FROM books WHERE 1=1'
-    params = []
     
     if q:
-        query += ''' AND (
-            LOWER(title) LIKE LOWER(?) OR 
-            LOWER(author) LIKE LOWER(?) OR 
-            LOWER(category) LIKE LOWER(?)
-        )'''
-        search_term = f'%{q}%'
-        params.extend([search_term, search_term, search_term])
+        match_query = build_match_query(q)
+        if not match_query:
+            return jsonify({'success': True, 'count': 0, 'data': [],
+                            'next_cursor': None, 'prev_cursor': None})
+        
+        weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+        query = f'''
+            SELECT b.*, bm25(books_fts, {weights}) AS rank
+            FROM books_fts JOIN books b ON b.id = books_fts.rowid
+            WHERE books_fts MATCH ?
+        '''
+        params = [match_query]
+        sort = [('rank', 'ASC'), ('id', 'ASC')]
+    else:
+        query = 'SELECT * FROM books b WHERE 1=1'
+        params = []
+        sort = [('id', 'ASC')]
     
     if title:
-        query += ' AND LOWER(title) LIKE LOWER(?)'
+        query += ' AND LOWER(b.title) LIKE LOWER(?)'
         params.append(f'%{title}%')
     
     if author:
-        query += ' AND LOWER(author) LIKE LOWER(?)'
+        query += ' AND LOWER(b.author) LIKE LOWER(?)'
         params.append(f'%{author}%')
     
     if category:
-        query += ' AND LOWER(category) = LOWER(?)'
+        query += ' AND LOWER(b.category) = LOWER(?)'
         params.append(category)
     
-    cursor.execute(query, params)
-    results = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    return jsonify({
-        'success': True,
-        'count': len(results),
-        'data': results
-    })
+    # rank chỉ dùng để sắp xếp / làm cursor, không trả về cho client (giữ nguyên schema sách)
+    # Stream toàn bộ kết quả khi client yêu cầu (Accept: application/x-ndjson hoặc ?stream=true)
+    mode = stream_mode()
+    if mode:
+        columns = ', '.join(table_columns(conn, 'books'))
+        order_by = ', '.join(f'{col} {direction}' for col, direction in sort)
+        return stream_response(conn.execute(f'SELECT {columns} FROM ({query}) ORDER BY {order_by}',
+                                            params), mode)
+    
+    try:
+        page = KeysetPaginator(sort).paginate(
+            conn, query, params,
+            cursor=request.args.get('cursor'),
+            limit=parse_limit(request.args.get('limit')),
+            json_select=json_object_sql(conn, 'books'))
+    except CursorError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return json_list_response(page['data'],
+                              next_cursor=page['next_cursor'],
+                              prev_cursor=page['prev_cursor'])
+
+
+# ==================== BULK IMPORT / EXPORT ====================
+
+# Upsert theo ISBN: sách đã có thì cập nhật, giữ nguyên số sách đang được mượn.
+# quantity mới nhỏ hơn số sách đang mượn làm available âm: trigger books_available_guard
+# abort dòng đó và bulk_upsert báo lỗi theo từng dòng
+BOOK_UPSERT_SQL = '''
+    INSERT INTO books (title, author, isbn, published_year, category, quantity, available)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(isbn) DO UPDATE SET
+        title = excluded.title,
+        author = excluded.author,
+        published_year = excluded.published_year,
+        category = excluded.category,
+        available = excluded.quantity - (books.quantity - books.available),
+        quantity = excluded.quantity
+'''
+
+
+def prepare_book_row(record):
+    """Record import đã validate -> (params cho BOOK_UPSERT_SQL, errors)"""
+    book = Book.create(record)
+    try:
+        quantity = int(book['quantity'])
+        year = int(book['published_year']) if book['published_year'] else None
+    except (TypeError, ValueError):
+        return None, ['Quantity phải là số']
+    
+    return (book['title'], book['author'], book['isbn'], year,
+            book['category'], quantity, quantity), []
+
+
+# POST /api/books:bulk (đăng ký trong app.py), body NDJSON hoặc CSV
+def bulk_import_books():
+    """Import/upsert sách hàng loạt"""
+    try:
+        summary = bulk_upsert(get_db(), read_records(request.stream, request.content_type),
+                              BOOK_VALIDATOR, prepare_book_row, BOOK_UPSERT_SQL)
+    except UnsupportedFormat as e:
+        return jsonify({'success': False, 'message': str(e)}), 415
+    
+    if summary['imported']:
+        book_cache.clear()
+    return jsonify({'success': summary['failed'] == 0, **summary})
+
+
+# localhost:3000/api/books/export?format=csv
+@book_bp.route('/export', methods=['GET'])
+@conditional('books')
+def export_books():
+    """Export toàn bộ sách dạng stream (NDJSON mặc định hoặc CSV)"""
+    cursor = get_db().execute('SELECT * FROM books ORDER BY id')
+    
+    if request.args.get('format') == 'csv':
+        return Response(stream_with_context(csv_stream(cursor)), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=books.csv'})
+    return Response(stream_with_context(ndjson_stream(cursor)), mimetype='application/x-ndjson')
@@ -1,21 +1,63 @@
 from flask import Blueprint, request, jsonify
-from database import get_db
-from models import Borrowing, Book, User
+from database import get_db, count_active_loans, run_in_transaction
+from models import Borrowing, User
+from pagination import KeysetPaginator, CursorError, parse_limit
+from streaming import stream_mode, stream_response
+from fastjson import json_object_sql, json_list_response, table_columns
+from cache import book_cache, user_cache
+from etag import conditional, collection_etag, resource_etag, is_fresh, not_modified, with_etag
+from batch_loader import request_loader
+from scheduler import FINE_SQL
 from datetime import datetime
-import json
 
 borrowing_bp = Blueprint('borrowings', __name__)
 
+
+class LoanError(Exception):
+    """Lỗi nghiệp vụ khi mượn/trả, rollback transaction và trả về response lỗi"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+# ?expand=book,user: gắn sách / người mượn vào từng phiếu, load theo lô bằng batch_loader
+# (mỗi bảng 1 query cho cả trang thay vì 1 query mỗi phiếu)
+EXPANSIONS = {
+    'book': ('books', 'book_id', 'SELECT * FROM books WHERE id IN ({keys})'),
+    'user': ('users', 'user_id', 'SELECT * FROM users WHERE id IN ({keys})'),
+}
+
+
+def parse_expand():
+    names = (name.strip() for name in request.args.get('expand', '').split(','))
+    return [name for name in names if name in EXPANSIONS]
+
+
+def expanded_tables():
+    """Bảng của các quan hệ được expand, để ETag đổi khi sách/user đổi"""
+    return tuple(EXPANSIONS[name][0] for name in parse_expand())
+
+
+def expand_borrowings(conn, borrowings, expand):
+    for name in expand:
+        table, column, sql = EXPANSIONS[name]
+        loader = request_loader(table, conn, sql)
+        pending = [loader.load(borrowing[column]) for borrowing in borrowings]
+        for borrowing, related in zip(borrowings, pending):
+            borrowing[name] = related.get()
+    return borrowings
+
+
 @borrowing_bp.route('', methods=['GET'])
+@conditional('borrowings', expanded_tables)
 def get_borrowings():
     """Lấy danh sách mượn sách"""
     status = request.args.get('status')
     user_id = request.args.get('userId')
     book_id = request.args.get('bookId')
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
     query = 'SELECT * FROM borrowings WHERE 1=1'
     params = []
     
@@ -29,11 +71,31 @@ def get_borrowings():
         query += ' AND book_id = ?'
         params.append(int(book_id))
     
-    cursor.execute(query, params)
-    borrowings = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    # Stream toàn bộ kết quả khi client yêu cầu (Accept: application/x-ndjson hoặc ?stream=true),
+    # bỏ qua expand
+    mode = stream_mode()
+    if mode:
+        return stream_response(get_db().execute(query + ' ORDER BY id', params), mode)
     
-    return jsonify({'success': True, 'count': len(borrowings), 'data': borrowings})
+    conn = get_db()
+    expand = parse_expand()
+    try:
+        page = KeysetPaginator([('id', 'ASC')]).paginate(
+            conn, query, params,
+            cursor=request.args.get('cursor'),
+            limit=parse_limit(request.args.get('limit')),
+            json_select=None if expand else json_object_sql(conn, 'borrowings'))
+    except CursorError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    if expand:
+        data = expand_borrowings(conn, page['data'], expand)
+        return jsonify({'success': True, 'count': len(data), 'data': data,
+                        'next_cursor': page['next_cursor'], 'prev_cursor': page['prev_cursor']})
+    
+    return json_list_response(page['data'],
+                              next_cursor=page['next_cursor'],
+                              prev_cursor=page['prev_cursor'])
 
 @borrowing_bp.route('/<int:borrowing_id>', methods=['GET'])
 def get_borrowing(borrowing_id):
@@ -42,12 +104,18 @@ def get_borrowing(borrowing_id):
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM borrowings WHERE id = ?', (borrowing_id,))
     borrowing = cursor.fetchone()
-    conn.close()
     
     if not borrowing:
         return jsonify({'success': False, 'message': 'Không tìm thấy phiếu mượn'}), 404
     
-    return jsonify({'success': True, 'data': dict(borrowing)})
+    data = expand_borrowings(conn, [dict(borrowing)], parse_expand())[0]
+    etags = [resource_etag('borrowings', borrowing)]
+    etags += [resource_etag(EXPANSIONS[name][0], data[name]) for name in parse_expand() if data[name]]
+    etag = '-'.join(etags)
+    if is_fresh(etag):
+        return not_modified(etag)
+    
+    return with_etag(jsonify({'success': True, 'data': data}), etag)
 
 @borrowing_bp.route('', methods=['POST'])
 def create_borrowing():
@@ -62,115 +130,92 @@ def create_borrowing():
     user_id = int(data['user_id'])
     book_id = int(data['book_id'])
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    # Kiểm tra user
-    cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-    user = cursor.fetchone()
-    if not user:
-        conn.close()
-        return jsonify({'success': False, 'message': 'Không tìm thấy người dùng'}), 404
-    
-    user_dict = dict(user)
-    
-    # Kiểm tra user có thể mượn không (dùng User model)
-    if not User.can_borrow(user_dict):
-        conn.close()
-        if not User.is_active(user_dict):
-            return jsonify({'success': False, 'message': 'Tài khoản không active'}), 400
-        return jsonify({'success': False, 'message': 'Đã mượn tối đa 5 quyển'}), 400
-    
-    # Kiểm tra book
-    cursor.execute('SELECT * FROM books WHERE id = ?', (book_id,))
-    book = cursor.fetchone()
-    if not book:
-        conn.close()
-        return jsonify({'success': False, 'message': 'Không tìm thấy sách'}), 404
-    
-    book_dict = dict(book)
-    
-    # Kiểm tra sách còn không (dùng Book model)
-    if not Book.is_available(book_dict):
-        conn.close()
-        return jsonify({'success': False, 'message': 'Sách không còn'}), 400
-    
     # Tạo borrowing từ model
     borrowing_data = Borrowing.create(data)
     
-    cursor.execute('''
-        INSERT INTO borrowings (user_id, book_id, borrow_date, due_date, status, fine)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (borrowing_data['user_id'], borrowing_data['book_id'],
-          borrowing_data['borrow_date'], borrowing_data['due_date'],
-          borrowing_data['status'], borrowing_data['fine']))
-    
-    borrowing_id = cursor.lastrowid
-    
-    # Cập nhật book available
-    cursor.execute('UPDATE books SET available = available - 1 WHERE id = ?', (book_id,))
-    
-    # Cập nhật user borrowed_books
-    borrowed = json.loads(user_dict['borrowed_books'])
-    borrowed.append(book_id)
-    cursor.execute('UPDATE users SET borrowed_books = ? WHERE id = ?', 
-                   (json.dumps(borrowed), user_id))
-    
-    conn.commit()
-    
-    cursor.execute('SELECT * FROM borrowings WHERE id = ?', (borrowing_id,))
-    new_borrowing = dict(cursor.fetchone())
-    conn.close()
+    def borrow(cursor):
+        # Kiểm tra user
+        cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
+        user = cursor.fetchone()
+        if not user:
+            raise LoanError('Không tìm thấy người dùng', 404)
+        
+        user_dict = dict(user)
+        
+        # Kiểm tra user có thể mượn không (dùng User model)
+        if not User.can_borrow(user_dict, count_active_loans(cursor.connection, user_id)):
+            if not User.is_active(user_dict):
+                raise LoanError('Tài khoản không active')
+            raise LoanError('Đã mượn tối đa 5 quyển')
+        
+        # Giảm available có điều kiện: không bao giờ xuống dưới 0
+        cursor.execute('UPDATE books SET available = available - 1 WHERE id = ? AND available > 0',
+                       (book_id,))
+        if cursor.rowcount == 0:
+            if not cursor.execute('SELECT id FROM books WHERE id = ?', (book_id,)).fetchone():
+                raise LoanError('Không tìm thấy sách', 404)
+            raise LoanError('Sách không còn')
+        
+        cursor.execute('''
+            INSERT INTO borrowings (user_id, book_id, borrow_date, due_date, status, fine)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (borrowing_data['user_id'], borrowing_data['book_id'],
+              borrowing_data['borrow_date'], borrowing_data['due_date'],
+              borrowing_data['status'], borrowing_data['fine']))
+        
+        cursor.execute('SELECT * FROM borrowings WHERE id = ?', (cursor.lastrowid,))
+        return dict(cursor.fetchone())
+    
+    try:
+        new_borrowing = run_in_transaction(get_db(), borrow)
+    except LoanError as e:
+        return jsonify({'success': False, 'message': e.message}), e.status
+    
+    # available của sách và borrowed_books của user đã thay đổi
+    book_cache.invalidate(book_id)
+    user_cache.invalidate(user_id)
     
     return jsonify({'success': True, 'message': 'Mượn sách thành công', 'data': new_borrowing}), 201
 
 @borrowing_bp.route('/<int:borrowing_id>/return', methods=['PATCH'])
 def return_book(borrowing_id):
     """Trả sách"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM borrowings WHERE id = ?', (borrowing_id,))
-    borrowing = cursor.fetchone()
-    
-    if not borrowing:
-        conn.close()
-        return jsonify({'success': False, 'message': 'Không tìm thấy phiếu mượn'}), 404
-    
-    borrowing_dict = dict(borrowing)
-    
-    if borrowing_dict['status'] == 'returned':
-        conn.close()
-        return jsonify({'success': False, 'message': 'Sách đã được trả'}), 400
-    
-    # Tính phí phạt bằng Borrowing model
     return_date = datetime.now().strftime('%Y-%m-%d')
-    fine = Borrowing.calculate_fine(borrowing_dict, return_date)
-    
-    # Cập nhật borrowing
-    cursor.execute('''
-        UPDATE borrowings SET return_date=?, status='returned', fine=? WHERE id=?
-    ''', (return_date, fine, borrowing_id))
-    
-    # Cập nhật book available
-    cursor.execute('UPDATE books SET available = available + 1 WHERE id = ?', 
-                   (borrowing_dict['book_id'],))
-    
-    # Cập nhật user borrowed_books
-    cursor.execute('SELECT borrowed_books FROM users WHERE id = ?', 
-                   (borrowing_dict['user_id'],))
-    user = cursor.fetchone()
-    borrowed = json.loads(user['borrowed_books'])
-    if borrowing_dict['book_id'] in borrowed:
-        borrowed.remove(borrowing_dict['book_id'])
-    cursor.execute('UPDATE users SET borrowed_books = ? WHERE id = ?',
-                   (json.dumps(borrowed), borrowing_dict['user_id']))
     
-    conn.commit()
-    
-    cursor.execute('SELECT * FROM borrowings WHERE id = ?', (borrowing_id,))
-    updated = dict(cursor.fetchone())
-    conn.close()
+    def give_back(cursor):
+        cursor.execute('SELECT * FROM borrowings WHERE id = ?', (borrowing_id,))
+        borrowing = cursor.fetchone()
+        
+        if not borrowing:
+            raise LoanError('Không tìm thấy phiếu mượn', 404)
+        
+        borrowing_dict = dict(borrowing)
+        
+        # Tính phí phạt bằng Borrowing model
+        fine = Borrowing.calculate_fine(borrowing_dict, return_date)
+        
+        # Chỉ phiếu chưa trả mới được cập nhật (tránh trả 2 lần)
+        cursor.execute('''
+            UPDATE borrowings SET return_date=?, status='returned', fine=?
+            WHERE id=? AND status != 'returned'
+        ''', (return_date, fine, borrowing_id))
+        if cursor.rowcount == 0:
+            raise LoanError('Sách đã được trả')
+        
+        # Cập nhật book available
+        cursor.execute('UPDATE books SET available = available + 1 WHERE id = ? AND available < quantity',
+                       (borrowing_dict['book_id'],))
+        
+        cursor.execute('SELECT * FROM borrowings WHERE id = ?', (borrowing_id,))
+        return dict(cursor.fetchone()), fine
+    
+    try:
+        updated, fine = run_in_transaction(get_db(), give_back)
+    except LoanError as e:
+        return jsonify({'success': False, 'message': e.message}), e.status
+    
+    book_cache.invalidate(updated['book_id'])
+    user_cache.invalidate(updated['user_id'])
     
     message = 'Trả sách thành công'
     if fine > 0:
@@ -180,27 +225,27 @@ def return_book(borrowing_id):
 
 @borrowing_bp.route('/overdue', methods=['GET'])
 def get_overdue_borrowings():
-    """Lấy danh sách quá hạn"""
+    """
+    Lấy danh sách quá hạn. status/fine tính ngay trong query theo ngày hiện tại nên đúng
+    cả khi không có scheduler.OverdueSweeper (flask run, gunicorn, ASGI); sweeper chỉ
+    ghi lại các giá trị này vào bảng
+    """
     today = datetime.now().strftime('%Y-%m-%d')
     
+    # Kết quả phụ thuộc cả ngày hiện tại (due_date < today)
+    etag = f'{collection_etag("borrowings", *expanded_tables())}-{today}'
+    if is_fresh(etag):
+        return not_modified(etag)
+    
     conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM borrowings WHERE status = ? AND due_date < ?', 
-                   ('borrowed', today))
-    overdue = [dict(row) for row in cursor.fetchall()]
-    
-    # Cập nhật status bằng Borrowing model
-    for b in overdue:
-        updated = Borrowing.update_overdue_status(b)
-        cursor.execute('UPDATE borrowings SET status=?, fine=? WHERE id=?',
-                       (updated['status'], updated['fine'], b['id']))
-    
-    conn.commit()
-    
-    cursor.execute('SELECT * FROM borrowings WHERE status IN (?, ?) AND due_date < ?',
-                   ('borrowed', 'overdue', today))
-    result = [dict(row) for row in cursor.fetchall()]
-    conn.close()
+    overdue_columns = {'status': "'overdue' AS status", 'fine': f'{FINE_SQL} AS fine'}
+    columns = ', '.join(overdue_columns.get(col, col) for col in table_columns(conn, 'borrowings'))
+    cursor.execute(f'''
+        SELECT {columns} FROM borrowings
+        WHERE status IN ('borrowed', 'overdue') AND due_date < :today
+    ''', {'today': today})
+    result = expand_borrowings(conn, [dict(row) for row in cursor.fetchall()], parse_expand())
     
-    return jsonify({'success': True, 'count': len(result), 'data': result})
+    return with_etag(jsonify({'success': True, 'count': len(result), 'data': result}), etag)
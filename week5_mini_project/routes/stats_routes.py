@@ -0,0 +1,125 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from database import get_db
+from pagination import CursorError, parse_limit
+from etag import collection_etag, conditional, is_fresh, not_modified, with_etag
+from scheduler import FINE_SQL
+
+stats_bp = Blueprint('stats', __name__)
+
+# Số liệu đọc từ bảng tổng hợp (stats.py) do trigger trên borrowings cập nhật,
+# bảng tổng hợp chỉ đổi khi borrowings đổi nên ETag theo bộ đếm của borrowings.
+
+TOP_LIMIT = 10
+
+# Phiếu chưa trả đã quá hạn, kể cả khi sweeper chưa chuyển status sang 'overdue'
+OVERDUE_WHERE = "status IN ('borrowed', 'overdue') AND due_date < :today"
+
+# /loans-per-category: (cột nhóm, ORDER BY); theo ngày thì đọc theo khóa chính (day, category)
+GRANULARITIES = {
+    'day': ('day, category', 'day, category'),
+    'total': ('category', 'loans DESC, category'),
+}
+
+
+def _top_limit():
+    return parse_limit(request.args.get('limit'), default=TOP_LIMIT)
+
+
+@stats_bp.errorhandler(CursorError)
+def bad_limit(e):
+    return jsonify({'success': False, 'message': str(e)}), 400
+
+
+@stats_bp.route('/loans-per-category', methods=['GET'])
+@conditional('borrowings')
+def loans_per_category():
+    """
+    Số lượt mượn / trả theo thể loại mỗi ngày (?granularity=day, mặc định) hoặc cộng dồn
+    cả khoảng (?granularity=total), lọc theo ?from=YYYY-MM-DD&to=YYYY-MM-DD&category=
+    """
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    category = request.args.get('category')
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify({'success': False,
+                        'message': f'granularity phải là một trong: {", ".join(GRANULARITIES)}'}), 400
+
+    columns, order_by = GRANULARITIES[granularity]
+    query = f'''
+        SELECT {columns}, SUM(loans) AS loans, SUM(returns) AS returns
+        FROM stats_category_daily WHERE 1=1
+    '''
+    params = []
+    if date_from:
+        query += ' AND day >= ?'
+        params.append(date_from)
+    if date_to:
+        query += ' AND day <= ?'
+        params.append(date_to)
+    if category:
+        query += ' AND category = ?'
+        params.append(category)
+    query += f' GROUP BY {columns} ORDER BY {order_by}'
+
+    rows = get_db().execute(query, params).fetchall()
+    return jsonify({
+        'success': True,
+        'granularity': granularity,
+        'data': [dict(row) for row in rows],
+        'from': date_from,
+        'to': date_to
+    })
+
+
+@stats_bp.route('/top-borrowers', methods=['GET'])
+@conditional('borrowings', 'users')
+def top_borrowers():
+    """Người mượn nhiều nhất (?limit=10), đọc theo index total_loans DESC"""
+    rows = get_db().execute('''
+        SELECT s.user_id, u.name, s.total_loans, s.active_loans
+        FROM stats_user_loans s JOIN users u ON u.id = s.user_id
+        WHERE s.total_loans > 0
+        ORDER BY s.total_loans DESC, s.user_id
+        LIMIT ?
+    ''', (_top_limit(),)).fetchall()
+    return jsonify({'success': True, 'data': [dict(row) for row in rows]})
+
+
+@stats_bp.route('/fines', methods=['GET'])
+def fines():
+    """
+    Tổng phí phạt đang nợ / đã thu và những người nợ nhiều nhất. Phí đang nợ tính ngay
+    trong query theo ngày hiện tại (như /api/borrowings/overdue) nên đúng cả khi không có
+    scheduler.OverdueSweeper; chỉ duyệt phiếu quá hạn qua index borrowings(status, due_date)
+    """
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    # Kết quả phụ thuộc cả ngày hiện tại (due_date < today)
+    etag = f'{collection_etag("borrowings", "users")}-{today}'
+    if is_fresh(etag):
+        return not_modified(etag)
+
+    conn = get_db()
+    totals = conn.execute(f'''
+        SELECT COALESCE(SUM({FINE_SQL}), 0) AS outstanding, COUNT(*) AS overdue_loans,
+               COALESCE((SELECT collected FROM stats_fines WHERE id = 1), 0) AS collected
+        FROM borrowings
+        WHERE {OVERDUE_WHERE}
+    ''', {'today': today}).fetchone()
+    debtors = conn.execute(f'''
+        SELECT d.user_id, u.name, d.outstanding_fine
+        FROM (SELECT user_id, SUM({FINE_SQL}) AS outstanding_fine
+              FROM borrowings WHERE {OVERDUE_WHERE} GROUP BY user_id) d
+        JOIN users u ON u.id = d.user_id
+        ORDER BY d.outstanding_fine DESC, d.user_id
+        LIMIT :limit
+    ''', {'today': today, 'limit': _top_limit()}).fetchall()
+    return with_etag(jsonify({
+        'success': True,
+        'data': {
+            **dict(totals),
+            'top_debtors': [dict(row) for row in debtors]
+        }
+    }), etag)
@@ -1,43 +1,66 @@
-from flask import Blueprint, request, jsonify
-from database import get_db
-from models import User
-import json
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from database import get_db, USERS_QUERY, count_active_loans
+from models import User, USER_VALIDATOR
+from pagination import KeysetPaginator, CursorError, parse_limit
+from bulk import bulk_upsert, read_records, UnsupportedFormat
+from streaming import ndjson_stream, csv_stream, stream_mode, stream_response
+from cache import user_cache
+from etag import (conditional, resource_etag, is_fresh, not_modified, precondition_failed,
+                  precondition_response, expected_version, with_etag)
 
 user_bp = Blueprint('users', __name__)
 
 @user_bp.route('', methods=['GET'])
+@conditional('users')
 def get_users():
     """Lấy danh sách users"""
     status = request.args.get('status')
     
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    query = 'SELECT * FROM users'
+    query = USERS_QUERY
     params = []
     if status:
-        query += ' WHERE status = ?'
+        query += ' WHERE users.status = ?'
         params.append(status)
     
-    cursor.execute(query, params)
-    users = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    
-    return jsonify({'success': True, 'count': len(users), 'data': users})
+    # Stream toàn bộ kết quả khi client yêu cầu (Accept: application/x-ndjson hoặc ?stream=true)
+    mode = stream_mode()
+    if mode:
+        return stream_response(get_db().execute(query + ' ORDER BY users.id', params), mode)
+    
+    try:
+        page = KeysetPaginator([('id', 'ASC')]).paginate(
+            get_db(), query, params,
+            cursor=request.args.get('cursor'),
+            limit=parse_limit(request.args.get('limit')))
+    except CursorError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'count': len(page['data']),
+        'data': page['data'],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor']
+    })
 
 @user_bp.route('/<int:user_id>', methods=['GET'])
 def get_user(user_id):
-    """Lấy user theo ID"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-    user = cursor.fetchone()
-    conn.close()
+    """Lấy user theo ID (qua cache)"""
+    user = user_cache.get(user_id, load_user)
     
     if not user:
         return jsonify({'success': False, 'message': 'Không tìm thấy người dùng'}), 404
     
-    return jsonify({'success': True, 'data': dict(user)})
+    etag = resource_etag('users', user)
+    if is_fresh(etag):
+        return not_modified(etag)
+    
+    return with_etag(jsonify({'success': True, 'data': user}), etag)
+
+def load_user(user_id):
+    """Đọc user (kèm borrowed_books) từ database cho user_cache"""
+    user = get_db().execute(USERS_QUERY + ' WHERE users.id = ?', (user_id,)).fetchone()
+    return dict(user) if user else None
 
 @user_bp.route('', methods=['POST'])
 def create_user():
@@ -54,24 +77,23 @@ def create_user():
     
     # Kiểm tra email trùng
     if cursor.execute('SELECT id FROM users WHERE email = ?', (data['email'],)).fetchone():
-        conn.close()
         return jsonify({'success': False, 'message': 'Email đã tồn tại'}), 400
     
     # Tạo user từ model
     user_data = User.create(data)
     
     cursor.execute('''
-        INSERT INTO users (name, email, phone, address, status, borrowed_books)
-        VALUES (?, ?, ?, ?, ?, ?)
+        INSERT INTO users (name, email, phone, address, status)
+        VALUES (?, ?, ?, ?, ?)
     ''', (user_data['name'], user_data['email'], user_data['phone'],
-          user_data['address'], user_data['status'], user_data['borrowed_books']))
+          user_data['address'], user_data['status']))
     
     conn.commit()
     user_id = cursor.lastrowid
+    user_cache.invalidate(user_id)
     
-    cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
+    cursor.execute(USERS_QUERY + ' WHERE users.id = ?', (user_id,))
     new_user = dict(cursor.fetchone())
-    conn.close()
     
     return jsonify({'success': True, 'message': 'Tạo người dùng thành công', 'data': new_user}), 201
 
@@ -88,22 +110,35 @@ def update_user(user_id):
     cursor = conn.cursor()
     
     cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-    if not cursor.fetchone():
-        conn.close()
+    user = cursor.fetchone()
+    if not user:
         return jsonify({'success': False, 'message': 'Không tìm thấy người dùng'}), 404
     
+    # If-Match: chỉ cập nhật khi client đang sửa đúng version hiện tại
+    failed = precondition_failed(resource_etag('users', user))
+    if failed:
+        return failed
+    
+    version = expected_version(user)
     cursor.execute('''
-        UPDATE users SET name=?, email=?, phone=?, address=?, status=? WHERE id=?
+        UPDATE users SET name=?, email=?, phone=?, address=?, status=?
+        WHERE id=? AND (? IS NULL OR version = ?)
     ''', (data['name'], data['email'], data['phone'],
-          data.get('address', ''), data.get('status', 'active'), user_id))
+          data.get('address', ''), data.get('status', 'active'), user_id, version, version))
+    updated = cursor.rowcount
     
     conn.commit()
+    user_cache.invalidate(user_id)
     
-    cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
+    cursor.execute(USERS_QUERY + ' WHERE users.id = ?', (user_id,))
     updated_user = dict(cursor.fetchone())
-    conn.close()
     
-    return jsonify({'success': True, 'message': 'Cập nhật thành công', 'data': updated_user})
+    # Có request khác sửa user giữa lúc đọc và ghi
+    if not updated:
+        return precondition_response(resource_etag('users', updated_user))
+    
+    return with_etag(jsonify({'success': True, 'message': 'Cập nhật thành công', 'data': updated_user}),
+                     resource_etag('users', updated_user))
 
 @user_bp.route('/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
@@ -111,20 +146,75 @@ def delete_user(user_id):
     conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
+    cursor.execute('SELECT id, version FROM users WHERE id = ?', (user_id,))
     user = cursor.fetchone()
     
     if not user:
-        conn.close()
         return jsonify({'success': False, 'message': 'Không tìm thấy người dùng'}), 404
     
+    failed = precondition_failed(resource_etag('users', user))
+    if failed:
+        return failed
+    
     # Kiểm tra bằng User model
-    if User.has_borrowed_books(dict(user)):
-        conn.close()
+    if User.has_borrowed_books(count_active_loans(conn, user_id)):
         return jsonify({'success': False, 'message': 'Không thể xóa người dùng đang mượn sách'}), 400
     
-    cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+    version = expected_version(user)
+    cursor.execute('DELETE FROM users WHERE id = ? AND (? IS NULL OR version = ?)',
+                   (user_id, version, version))
+    deleted = cursor.rowcount
     conn.commit()
-    conn.close()
+    user_cache.invalidate(user_id)
+    
+    if not deleted:
+        return precondition_response()
     
     return jsonify({'success': True, 'message': 'Xóa người dùng thành công'})
+
+
+# ==================== BULK IMPORT / EXPORT ====================
+
+# Upsert theo email
+USER_UPSERT_SQL = '''
+    INSERT INTO users (name, email, phone, address, status)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(email) DO UPDATE SET
+        name = excluded.name,
+        phone = excluded.phone,
+        address = excluded.address,
+        status = excluded.status
+'''
+
+
+def prepare_user_row(record):
+    """Record import đã validate -> (params cho USER_UPSERT_SQL, errors)"""
+    user = User.create(record)
+    return (user['name'], user['email'], user['phone'], user['address'], user['status']), []
+
+
+# POST /api/users:bulk (đăng ký trong app.py), body NDJSON hoặc CSV
+def bulk_import_users():
+    """Import/upsert user hàng loạt"""
+    try:
+        summary = bulk_upsert(get_db(), read_records(request.stream, request.content_type),
+                              USER_VALIDATOR, prepare_user_row, USER_UPSERT_SQL)
+    except UnsupportedFormat as e:
+        return jsonify({'success': False, 'message': str(e)}), 415
+    
+    if summary['imported']:
+        user_cache.clear()
+    return jsonify({'success': summary['failed'] == 0, **summary})
+
+
+# localhost:3000/api/users/export?format=csv
+@user_bp.route('/export', methods=['GET'])
+@conditional('users')
+def export_users():
+    """Export toàn bộ user dạng stream (NDJSON mặc định hoặc CSV), cùng cột với GET /api/users"""
+    cursor = get_db().execute(USERS_QUERY + ' ORDER BY users.id')
+    
+    if request.args.get('format') == 'csv':
+        return Response(stream_with_context(csv_stream(cursor)), mimetype='text/csv',
+                        headers={'Content-Disposition': 'attachment; filename=users.csv'})
+    return Response(stream_with_context(ndjson_stream(cursor)), mimetype='application/x-ndjson')
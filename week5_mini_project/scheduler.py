@@ -0,0 +1,80 @@
+import threading
+from datetime import datetime
+from database import pool, run_in_transaction
+
+# Chu kỳ quét phiếu quá hạn (giây)
+SWEEP_INTERVAL = 15 * 60
+
+# Phí phạt 1000 VNĐ/ngày tính đến :today
+FINE_SQL = 'CAST(julianday(:today) - julianday(due_date) AS INTEGER) * 1000.0'
+
+# Tính cho tất cả phiếu chưa trả đã quá hạn trong 1 câu UPDATE
+# (dùng index borrowings(status, due_date)); phiếu không đổi gì thì không bị ghi lại
+OVERDUE_SWEEP_SQL = f'''
+    UPDATE borrowings
+    SET status = 'overdue',
+        fine = {FINE_SQL}
+    WHERE status IN ('borrowed', 'overdue')
+      AND due_date < :today
+      AND (status = 'borrowed' OR fine != {FINE_SQL})
+'''
+
+
+def sweep_overdue(conn, today=None):
+    """Cập nhật status/fine cho phiếu quá hạn. Returns: số phiếu được cập nhật"""
+    today = today or datetime.now().strftime('%Y-%m-%d')
+
+    def sweep(cursor):
+        cursor.execute(OVERDUE_SWEEP_SQL, {'today': today})
+        return cursor.rowcount
+
+    return run_in_transaction(conn, sweep)
+
+
+class OverdueSweeper(threading.Thread):
+    """Thread nền chạy sweep_overdue định kỳ"""
+
+    def __init__(self, interval=SWEEP_INTERVAL):
+        super().__init__(name='overdue-sweeper', daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self.last_run = None
+        self.last_updated = 0
+
+    def run_once(self):
+        conn = pool.acquire()
+        try:
+            self.last_updated = sweep_overdue(conn)
+            self.last_run = datetime.now().isoformat(timespec='seconds')
+        finally:
+            pool.release(conn)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f'✗ Overdue sweep lỗi: {e}')
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+sweeper = None
+
+
+def start_overdue_sweeper(interval=SWEEP_INTERVAL):
+    """Khởi động sweeper (chạy ngay một lần, sau đó mỗi interval giây)"""
+    global sweeper
+    if sweeper is None or not sweeper.is_alive():
+        sweeper = OverdueSweeper(interval)
+        sweeper.start()
+    return sweeper
+
+
+def stop_overdue_sweeper():
+    """Dừng sweeper khi shutdown"""
+    if sweeper is not None:
+        sweeper.stop()
+        sweeper.join(timeout=5)
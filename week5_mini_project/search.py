@@ -0,0 +1,80 @@
+import re
+import unicodedata
+
+# unicode61 + remove_diacritics bỏ dấu tiếng Việt (ă, ê, ơ, ư, ...) nhưng không
+# đổi "đ" thành "d" vì "đ" là một chữ cái riêng, nên cần fold thêm bằng replace()
+FOLD_SQL = "replace(replace({0}, 'đ', 'd'), 'Đ', 'D')"
+
+# Bảng FTS5 contentless: chỉ lưu index, dữ liệu gốc vẫn nằm trong books
+FTS_SCHEMA = [
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, author, category,
+        content='',
+        tokenize="unicode61 remove_diacritics 2"
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author, category)
+        VALUES (NEW.id, {FOLD_SQL.format('NEW.title')}, {FOLD_SQL.format('NEW.author')},
+                {FOLD_SQL.format('NEW.category')});
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, category)
+        VALUES ('delete', OLD.id, {FOLD_SQL.format('OLD.title')}, {FOLD_SQL.format('OLD.author')},
+                {FOLD_SQL.format('OLD.category')});
+    END
+    ''',
+    # Chỉ reindex khi cột được index thay đổi (không chạy khi mượn/trả đổi available)
+    f'''
+    CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author, category ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, category)
+        VALUES ('delete', OLD.id, {FOLD_SQL.format('OLD.title')}, {FOLD_SQL.format('OLD.author')},
+                {FOLD_SQL.format('OLD.category')});
+        INSERT INTO books_fts(rowid, title, author, category)
+        VALUES (NEW.id, {FOLD_SQL.format('NEW.title')}, {FOLD_SQL.format('NEW.author')},
+                {FOLD_SQL.format('NEW.category')});
+    END
+    ''',
+]
+
+# Trọng số bm25 cho (title, author, category)
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def fold_text(text):
+    """Fold giống FOLD_SQL để câu truy vấn khớp với dữ liệu đã index"""
+    text = unicodedata.normalize('NFC', text)
+    return text.replace('đ', 'd').replace('Đ', 'D')
+
+
+def build_match_query(q):
+    """
+    Chuyển từ khóa người dùng thành câu MATCH của FTS5:
+    mỗi từ là một prefix query, các từ nối với nhau bằng AND.
+    "clean cod" -> '"clean"* "cod"*'
+    Returns: None nếu không có từ nào hợp lệ
+    """
+    tokens = _TOKEN_RE.findall(fold_text(q))
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def rebuild_fts_index(conn, commit=True):
+    """Đánh index lại toàn bộ books (dùng cho database tạo trước khi có FTS)"""
+    for statement in FTS_SCHEMA:
+        conn.execute(statement)
+    conn.execute("INSERT INTO books_fts(books_fts) VALUES ('delete-all')")
+    conn.execute(f'''
+        INSERT INTO books_fts(rowid, title, author, category)
+        SELECT id, {FOLD_SQL.format('title')}, {FOLD_SQL.format('author')}, {FOLD_SQL.format('category')}
+        FROM books
+    ''')
+    if commit:
+        conn.commit()
@@ -0,0 +1,89 @@
+"""
+Production entry point (thay cho app.run(debug=True)):
+
+    python serve.py                       # gunicorn nếu có, Windows dùng waitress
+    python serve.py --server waitress --port 8000
+    python serve.py --profile             # header Server-Timing + file cProfile trong ./profiles
+    python serve.py --no-preload
+
+Cấu hình gunicorn nằm trong gunicorn.conf.py.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_server():
+    if os.name == 'nt':
+        return 'waitress'
+    try:
+        import gunicorn  # noqa: F401
+        return 'gunicorn'
+    except ImportError:
+        return 'waitress'
+
+
+def run_gunicorn(port):
+    os.environ['PORT'] = str(port)
+    # exec để gunicorn master nhận trực tiếp tín hiệu (SIGTERM = graceful shutdown).
+    # --pythonpath (không --chdir): import app từ APP_DIR nhưng vẫn ở cwd hiện tại,
+    # nên library.db là cùng file với waitress / app.py
+    os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn',
+                               '-c', os.path.join(APP_DIR, 'gunicorn.conf.py'),
+                               '--pythonpath', APP_DIR, 'app:app'])
+
+
+def run_waitress(port):
+    from waitress import create_server
+    from app import app
+    from database import POOL_SIZE, pool
+    from scheduler import start_overdue_sweeper, stop_overdue_sweeper
+
+    # Waitress: 1 process nhiều thread, mỗi thread cần 1 connection trong pool
+    threads = int(os.environ.get('THREADS', min(multiprocessing.cpu_count() * 2, POOL_SIZE)))
+    server = create_server(app, host='0.0.0.0', port=port, threads=threads)
+
+    # SIGTERM (docker stop, systemd) xử lý giống Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    start_overdue_sweeper()
+    print(f'waitress: http://0.0.0.0:{port} threads={threads}')
+    try:
+        server.run()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.close()
+        stop_overdue_sweeper()
+        if not pool.drain():
+            print('✗ Còn connection chưa trả về pool khi thoát')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chạy Library API ở chế độ production')
+    parser.add_argument('--server', choices=('gunicorn', 'waitress'), default=default_server())
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 3000)))
+    parser.add_argument('--profile', action='store_true',
+                        help='Server-Timing cho mọi request và cProfile vào ./profiles')
+    parser.add_argument('--no-preload', action='store_true', help='gunicorn: load app trong từng worker')
+    args = parser.parse_args()
+
+    # Đặt env trước khi import app (app.py đọc PROFILE lúc import)
+    if args.profile:
+        os.environ['PROFILE'] = '1'
+        os.environ.setdefault('PROFILE_DIR', os.path.join(os.getcwd(), 'profiles'))
+    if args.no_preload:
+        os.environ['PRELOAD'] = '0'
+
+    if args.server == 'gunicorn':
+        run_gunicorn(args.port)
+    else:
+        run_waitress(args.port)
+
+
+if __name__ == '__main__':
+    main()
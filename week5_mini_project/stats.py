@@ -0,0 +1,156 @@
+# Bảng tổng hợp cho /api/stats, được trigger trên borrowings cập nhật theo delta
+# (mượn, trả, overdue sweep đổi status/fine) nên đọc thống kê chỉ tốn O(kết quả)
+# thay vì quét toàn bộ lịch sử borrowings.
+
+# Đóng góp của một phiếu mượn ({0} = NEW / OLD / alias bảng)
+ACTIVE = "({0}.status IN ('borrowed', 'overdue'))"
+OVERDUE = "({0}.status = 'overdue')"
+OUTSTANDING = "(CASE WHEN {0}.status = 'overdue' THEN COALESCE({0}.fine, 0) ELSE 0 END)"
+COLLECTED = "(CASE WHEN {0}.status = 'returned' THEN COALESCE({0}.fine, 0) ELSE 0 END)"
+CATEGORY = "COALESCE((SELECT category FROM books WHERE id = {0}.book_id), 'Uncategorized')"
+# Ngày theo giờ địa phương, giống datetime.now() mà app dùng cho borrow_date / return_date
+RETURN_DAY = "COALESCE({0}.return_date, date('now', 'localtime'))"
+
+
+def _user_delta(sign, row):
+    return f'''
+        INSERT INTO stats_user_loans (user_id, total_loans, active_loans, outstanding_fine, fines_collected)
+        VALUES ({row}.user_id, {sign}1, {sign}{ACTIVE.format(row)}, {sign}{OUTSTANDING.format(row)},
+                {sign}{COLLECTED.format(row)})
+        ON CONFLICT(user_id) DO UPDATE SET
+            total_loans = total_loans + excluded.total_loans,
+            active_loans = active_loans + excluded.active_loans,
+            outstanding_fine = outstanding_fine + excluded.outstanding_fine,
+            fines_collected = fines_collected + excluded.fines_collected;
+        UPDATE stats_fines SET
+            outstanding = outstanding {sign} {OUTSTANDING.format(row)},
+            overdue_loans = overdue_loans {sign} {OVERDUE.format(row)},
+            collected = collected {sign} {COLLECTED.format(row)}
+        WHERE id = 1;
+    '''
+
+
+def _category_delta(sign, row):
+    return f'''
+        INSERT INTO stats_category_daily (day, category, loans, returns)
+        VALUES ({row}.borrow_date, {CATEGORY.format(row)}, {sign}1, 0)
+        ON CONFLICT(day, category) DO UPDATE SET loans = loans + excluded.loans;
+        INSERT INTO stats_category_daily (day, category, loans, returns)
+        SELECT {RETURN_DAY.format(row)}, {CATEGORY.format(row)}, 0, {sign}1
+        WHERE {row}.status = 'returned'
+        ON CONFLICT(day, category) DO UPDATE SET returns = returns + excluded.returns;
+    '''
+
+
+STATS_SCHEMA = [
+    # Số lượt mượn (theo borrow_date) và trả (theo return_date) mỗi ngày mỗi thể loại
+    '''
+    CREATE TABLE IF NOT EXISTS stats_category_daily (
+        day TEXT NOT NULL,
+        category TEXT NOT NULL,
+        loans INTEGER NOT NULL DEFAULT 0,
+        returns INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, category)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stats_user_loans (
+        user_id INTEGER PRIMARY KEY,
+        total_loans INTEGER NOT NULL DEFAULT 0,
+        active_loans INTEGER NOT NULL DEFAULT 0,
+        outstanding_fine REAL NOT NULL DEFAULT 0,
+        fines_collected REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_stats_user_total ON stats_user_loans(total_loans DESC, user_id)',
+    'CREATE INDEX IF NOT EXISTS idx_stats_user_outstanding ON stats_user_loans(outstanding_fine DESC, user_id)',
+    # Một dòng duy nhất: tổng phí phạt đang nợ / đã thu
+    '''
+    CREATE TABLE IF NOT EXISTS stats_fines (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        outstanding REAL NOT NULL DEFAULT 0,
+        overdue_loans INTEGER NOT NULL DEFAULT 0,
+        collected REAL NOT NULL DEFAULT 0
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS stats_borrowings_insert AFTER INSERT ON borrowings BEGIN
+        {_category_delta('+', 'NEW')}
+        {_user_delta('+', 'NEW')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS stats_borrowings_delete AFTER DELETE ON borrowings BEGIN
+        {_category_delta('-', 'OLD')}
+        {_user_delta('-', 'OLD')}
+    END
+    ''',
+    # Trả sách / overdue sweep: chỉ cộng phần chênh lệch giữa OLD và NEW
+    f'''
+    CREATE TRIGGER IF NOT EXISTS stats_borrowings_update AFTER UPDATE OF status, fine ON borrowings BEGIN
+        INSERT INTO stats_category_daily (day, category, loans, returns)
+        SELECT {RETURN_DAY.format('NEW')}, {CATEGORY.format('NEW')}, 0, 1
+        WHERE NEW.status = 'returned' AND OLD.status != 'returned'
+        ON CONFLICT(day, category) DO UPDATE SET returns = returns + 1;
+        UPDATE stats_user_loans SET
+            active_loans = active_loans + {ACTIVE.format('NEW')} - {ACTIVE.format('OLD')},
+            outstanding_fine = outstanding_fine + {OUTSTANDING.format('NEW')} - {OUTSTANDING.format('OLD')},
+            fines_collected = fines_collected + {COLLECTED.format('NEW')} - {COLLECTED.format('OLD')}
+        WHERE user_id = NEW.user_id;
+        UPDATE stats_fines SET
+            outstanding = outstanding + {OUTSTANDING.format('NEW')} - {OUTSTANDING.format('OLD')},
+            overdue_loans = overdue_loans + {OVERDUE.format('NEW')} - {OVERDUE.format('OLD')},
+            collected = collected + {COLLECTED.format('NEW')} - {COLLECTED.format('OLD')}
+        WHERE id = 1;
+    END
+    ''',
+]
+
+
+STATS_TRIGGERS = ('stats_borrowings_insert', 'stats_borrowings_delete', 'stats_borrowings_update')
+
+
+def recreate_stats_triggers(conn):
+    """Tạo lại trigger tổng hợp theo STATS_SCHEMA hiện tại (CREATE IF NOT EXISTS không thay trigger cũ)"""
+    for trigger in STATS_TRIGGERS:
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    for statement in STATS_SCHEMA:
+        conn.execute(statement)
+
+
+def rebuild_stats(conn, commit=True):
+    """Tính lại toàn bộ bảng tổng hợp từ borrowings (backfill / kiểm tra lệch số liệu)"""
+    for statement in STATS_SCHEMA:
+        conn.execute(statement)
+    conn.execute('DELETE FROM stats_category_daily')
+    conn.execute('DELETE FROM stats_user_loans')
+    conn.execute('DELETE FROM stats_fines')
+
+    category = "COALESCE(b.category, 'Uncategorized')"
+    conn.execute(f'''
+        INSERT INTO stats_category_daily (day, category, loans, returns)
+        SELECT day, category, SUM(loans), SUM(returns) FROM (
+            SELECT br.borrow_date AS day, {category} AS category, 1 AS loans, 0 AS returns
+            FROM borrowings br LEFT JOIN books b ON b.id = br.book_id
+            UNION ALL
+            SELECT {RETURN_DAY.format('br')}, {category}, 0, 1
+            FROM borrowings br LEFT JOIN books b ON b.id = br.book_id
+            WHERE br.status = 'returned'
+        )
+        GROUP BY day, category
+    ''')
+    conn.execute(f'''
+        INSERT INTO stats_user_loans (user_id, total_loans, active_loans, outstanding_fine, fines_collected)
+        SELECT user_id, COUNT(*), SUM({ACTIVE.format('br')}), SUM({OUTSTANDING.format('br')}),
+               SUM({COLLECTED.format('br')})
+        FROM borrowings br
+        GROUP BY user_id
+    ''')
+    conn.execute(f'''
+        INSERT INTO stats_fines (id, outstanding, overdue_loans, collected)
+        SELECT 1, COALESCE(SUM({OUTSTANDING.format('br')}), 0), COALESCE(SUM({OVERDUE.format('br')}), 0),
+               COALESCE(SUM({COLLECTED.format('br')}), 0)
+        FROM borrowings br
+    ''')
+    if commit:
+        conn.commit()
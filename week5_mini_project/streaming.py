@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+from flask import Response, request, stream_with_context
+
+# Số dòng đọc mỗi lần fetchmany khi stream
+STREAM_BATCH_SIZE = 1000
+
+JSON_MIMETYPE = 'application/json'
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def iter_batches(cursor, batch_size=STREAM_BATCH_SIZE):
+    """Đọc cursor theo từng batch thay vì fetchall() toàn bộ kết quả"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+
+def ndjson_stream(cursor, batch_size=STREAM_BATCH_SIZE):
+    """Mỗi dòng một JSON object (application/x-ndjson)"""
+    columns = [col[0] for col in cursor.description]
+    for rows in iter_batches(cursor, batch_size):
+        yield ''.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n'
+                      for row in rows)
+
+
+def csv_stream(cursor, batch_size=STREAM_BATCH_SIZE):
+    """CSV có header, ghi từng batch"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([col[0] for col in cursor.description])
+    for rows in iter_batches(cursor, batch_size):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def json_array_stream(cursor, batch_size=STREAM_BATCH_SIZE):
+    """
+    Envelope {"success": true, "data": [...], "count": N} được ghi dần từng batch,
+    count đặt cuối vì chỉ biết sau khi đọc hết cursor
+    """
+    columns = [col[0] for col in cursor.description]
+    count = 0
+    yield '{"success": true, "data": ['
+    for rows in iter_batches(cursor, batch_size):
+        chunk = ', '.join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) for row in rows)
+        yield (', ' if count else '') + chunk
+        count += len(rows)
+    yield f'], "count": {count}}}'
+
+
+def negotiate_stream_mode(accept_mimetypes, args):
+    """
+    Client yêu cầu stream không phân trang? Dùng chung cho Flask và asgi_app (Quart)
+    để cùng URL/header luôn chọn cùng representation.
+    Returns: 'ndjson' (Accept: application/x-ndjson), 'json' (?stream=true) hoặc None
+    """
+    if accept_mimetypes.best_match([JSON_MIMETYPE, NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+        return 'ndjson'
+    if args.get('stream', '').lower() in ('1', 'true'):
+        return 'json'
+    return None
+
+
+def stream_mode():
+    """negotiate_stream_mode() cho request Flask hiện tại"""
+    return negotiate_stream_mode(request.accept_mimetypes, request.args)
+
+
+def stream_response(cursor, mode):
+    """Response stream toàn bộ kết quả của cursor với bộ nhớ không đổi"""
+    if mode == 'ndjson':
+        return Response(stream_with_context(ndjson_stream(cursor)), mimetype=NDJSON_MIMETYPE)
+    return Response(stream_with_context(json_array_stream(cursor)), mimetype=JSON_MIMETYPE)
@@ -0,0 +1,117 @@
+# coding: utf-8
+"""
+asgi_app.py phải trả cùng status, body và ETag như Flask app (app.py) cho cùng URL.
+
+Cần: pip install -r requirements-asgi.txt
+Chạy (trong week5_mini_project): python -m pytest tests  hoặc  python -m unittest discover tests
+"""
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+HAS_ASGI = all(importlib.util.find_spec(name) for name in ('quart', 'aiosqlite'))
+
+flask_app = None
+asgi_app = None
+_workdir = None
+_cwd = None
+
+
+def setUpModule():
+    global flask_app, asgi_app, _workdir, _cwd
+    if not HAS_ASGI:
+        return
+    # database.DATABASE là đường dẫn tương đối: chạy trên library.db tạm
+    _cwd = os.getcwd()
+    _workdir = tempfile.TemporaryDirectory()
+    os.chdir(_workdir.name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+        import asgi_app as asgi
+        from database import seed_db
+        seed_db()
+    flask_app, asgi_app = app.app, asgi.app
+
+    client = flask_app.test_client()
+    for user_id, book_id in ((1, 1), (1, 2), (2, 3), (3, 1)):
+        client.post('/api/borrowings', json={'user_id': user_id, 'book_id': book_id})
+
+
+def tearDownModule():
+    if _workdir is not None:
+        os.chdir(_cwd)
+        _workdir.cleanup()
+
+
+@unittest.skipUnless(HAS_ASGI, 'cần quart và aiosqlite (requirements-asgi.txt)')
+class TestAsgiParity(unittest.IsolatedAsyncioTestCase):
+    """So sánh response của asgi_app với Flask app"""
+
+    URLS = [
+        '/api/borrowings?expand=book,user',
+        '/api/borrowings?expand=book,user&limit=2',
+        '/api/borrowings?expand=book',
+        '/api/borrowings/1?expand=book,user',
+        '/api/borrowings',
+        '/api/borrowings/1',
+    ]
+
+    async def asyncSetUp(self):
+        self._app_context = asgi_app.test_app()
+        test_app = await self._app_context.__aenter__()
+        self.asgi = test_app.test_client()
+        self.flask = flask_app.test_client()
+
+    async def asyncTearDown(self):
+        await self._app_context.__aexit__(None, None, None)
+
+    async def test_same_body_and_etag(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                expected = self.flask.get(url)
+                response = await self.asgi.get(url)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(await response.get_json(), expected.get_json())
+                self.assertEqual(response.headers.get('ETag'), expected.headers.get('ETag'))
+
+    async def test_same_stream_negotiation(self):
+        requests = [
+            ('/api/books?stream=TRUE', {}),
+            ('/api/users?stream=True', {}),
+            ('/api/borrowings?stream=1', {}),
+            ('/api/users', {'Accept': 'application/x-ndjson'}),
+            ('/api/users', {'Accept': 'application/json, application/x-ndjson;q=0.5'}),
+            ('/api/borrowings', {'Accept': 'application/x-ndjson;q=0.9, application/json;q=0.1'}),
+        ]
+        for url, headers in requests:
+            with self.subTest(url=url, headers=headers):
+                expected = self.flask.get(url, headers=headers)
+                response = await self.asgi.get(url, headers=headers)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.mimetype, expected.mimetype)
+                self.assertEqual(await response.get_data(), expected.get_data())
+                self.assertEqual(response.headers.get('ETag'), expected.headers.get('ETag'))
+
+    async def test_expand_included_in_body(self):
+        response = await self.asgi.get('/api/borrowings?expand=book,user')
+        for borrowing in (await response.get_json())['data']:
+            self.assertEqual(borrowing['book']['id'], borrowing['book_id'])
+            self.assertEqual(borrowing['user']['id'], borrowing['user_id'])
+
+    async def test_flask_etag_revalidates_on_asgi(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                etag = self.flask.get(url).headers['ETag']
+                response = await self.asgi.get(url, headers={'If-None-Match': etag})
+                self.assertEqual(response.status_code, 304)
+
+
+if __name__ == '__main__':
+    unittest.main()
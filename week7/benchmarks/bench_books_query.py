@@ -0,0 +1,96 @@
+"""
+Kiểm tra plan của GET /books (database.find_books) bằng explain() trên MongoDB thật:
+  - old: index (author, _id, year) + (year, _id)
+  - new: index (author, _id, year), year lọc khi duyệt index _id (create_book_indexes)
+
+Với mỗi kiểu query in ra: các stage của winning plan (có SORT = sort trong bộ nhớ),
+index được dùng, keys/docs examined và thời gian server.
+
+Cần MongoDB (mongomock không hỗ trợ explain), dữ liệu ghi vào database riêng:
+  MONGODB_URI=mongodb://localhost:27017 python benchmarks/bench_books_query.py [--books 100000]
+(MONGODB_DB mặc định book_bench, collection books trong đó bị xóa và seed lại)
+"""
+import argparse
+import os
+import random
+import sys
+
+os.environ.setdefault('MONGODB_DB', 'book_bench')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swagger_server.database import database
+from swagger_server.database.database import find_books, get_db
+
+LIMIT = 20
+
+
+def seed(n):
+    books = get_db().books
+    books.drop()
+    rng = random.Random(1)
+    batch = []
+    for i in range(n):
+        batch.append({"title": f"Book {i}", "author": f"Author {rng.randrange(200)}",
+                      "year": rng.randrange(1950, 2025)})
+        if len(batch) == 10000:
+            books.insert_many(batch)
+            batch = []
+    if batch:
+        books.insert_many(batch)
+
+
+def use_indexes(variant):
+    books = get_db().books
+    books.drop_indexes()
+    books.create_index([("author", 1), ("_id", 1), ("year", 1)])
+    if variant == 'old':
+        books.create_index([("year", 1), ("_id", 1)])
+
+
+def plan_stages(stage):
+    """Các stage của winning plan từ ngoài vào trong, vd. LIMIT<-FETCH<-IXSCAN(_id_)"""
+    names = []
+    while stage:
+        name = stage["stage"]
+        if "indexName" in stage:
+            name += f'({stage["indexName"]})'
+        names.append(name)
+        stage = stage.get("inputStage") or (stage.get("inputStages") or [None])[0]
+    return '<-'.join(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GET /books query plans: old vs new indexes')
+    parser.add_argument('--books', type=int, default=100000)
+    args = parser.parse_args()
+
+    if not os.getenv('MONGODB_URI'):
+        sys.exit('Cần MONGODB_URI trỏ tới MongoDB (explain không chạy được với mongomock)')
+    seed(args.books)
+    middle = get_db().books.find({}, {"_id": 1}).sort("_id", 1).skip(args.books // 2).limit(1)[0]["_id"]
+
+    queries = {
+        'first page': {},
+        'after cursor': {"after": str(middle)},
+        'author': {"author": "Author 7"},
+        'author+year': {"author": "Author 7", "year_from": 1990, "year_to": 2000},
+        'year 2000-2001': {"year_from": 2000, "year_to": 2001},
+        'year >= 1960': {"year_from": 1960},
+    }
+    print(f'{args.books} books, limit={LIMIT}')
+    print(f'{"index":<5} {"query":<15} {"keys":>7} {"docs":>7} {"ms":>5}  plan')
+    for variant in ('old', 'new'):
+        use_indexes(variant)
+        for name, params in queries.items():
+            explain = find_books(LIMIT, **params).explain()
+            stats = explain["executionStats"]
+            winning = explain["queryPlanner"]["winningPlan"]
+            # MongoDB 7+ (slot-based engine) bọc plan trong queryPlan
+            stages = plan_stages(winning.get("queryPlan", winning))
+            print(f'{variant:<5} {name:<15} {stats["totalKeysExamined"]:>7} {stats["totalDocsExamined"]:>7} '
+                  f'{stats["executionTimeMillis"]:>5}  {stages}')
+    database.get_client().close()
+
+
+if __name__ == '__main__':
+    main()
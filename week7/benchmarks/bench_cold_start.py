@@ -0,0 +1,84 @@
+"""
+Đo cold start của week7 trong process Python mới:
+  - lazy:  khởi động hiện tại (không query lúc import, seed là lệnh riêng)
+  - eager: như trước đây: wipe + seed (create_database) và load cả books/users trước khi tạo app
+
+Mỗi lần chạy ghi lại: thời gian import, thời gian tới lúc app sẵn sàng bind port,
+request /api/ready đầu tiên và /api/books đầu tiên (tính từ đầu process con).
+
+Backend:
+  --backend mongomock         (mặc định, cần pip install mongomock)
+  --backend uri               dùng MONGODB_URI, vd. mongod local mongodb://localhost:27017
+                              (chế độ lazy giả định đã chạy python -m swagger_server seed)
+
+Chạy: python benchmarks/bench_cold_start.py [--runs 5] [--backend mongomock|uri]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import time
+started = time.perf_counter()
+import contextlib, io, json, sys
+from swagger_server.__main__ import create_app
+from swagger_server.database import database
+imported = time.perf_counter()
+
+mode, backend = sys.argv[1:3]
+quiet = contextlib.redirect_stdout(io.StringIO())
+if backend == "mongomock":
+    import mongomock
+    database.use_client(mongomock.MongoClient())
+    if mode == "lazy":
+        with quiet:
+            database.create_database()  # seed chạy trước bằng lệnh riêng, không tính
+setup = time.perf_counter() - imported
+
+if mode == "eager":
+    with quiet:
+        database.create_database()
+    database.book_cache.all()
+    database.user_cache.all()
+app = create_app()
+bindable = time.perf_counter() - setup
+
+client = app.app.test_client()
+assert client.get("/api/ready").status_code == 200
+first_ready = time.perf_counter() - setup
+assert client.get("/api/books").status_code == 200
+first_books = time.perf_counter() - setup
+
+print(json.dumps({k: (v - started) * 1000 for k, v in
+                  {"import": imported, "bind": bindable, "ready": first_ready, "books": first_books}.items()}))
+'''
+
+
+def run(mode, backend):
+    output = subprocess.run([sys.executable, '-c', CHILD, mode, backend], cwd=APP_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='week7 cold start: lazy vs eager')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--backend', choices=('mongomock', 'uri'), default='mongomock')
+    args = parser.parse_args()
+
+    print(f'backend={args.backend}, median of {args.runs} runs (ms từ đầu process)')
+    print(f'{"mode":<6} {"import":>8} {"bind":>8} {"ready":>8} {"books":>8}')
+    for mode in ('eager', 'lazy'):
+        results = [run(mode, args.backend) for _ in range(args.runs)]
+        median = {key: statistics.median(r[key] for r in results) for key in results[0]}
+        print(f'{mode:<6} {median["import"]:>8.1f} {median["bind"]:>8.1f} '
+              f'{median["ready"]:>8.1f} {median["books"]:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Đo phần tra cứu user khi login: quét list bằng next(...) (cách cũ) so với
+index username của CollectionCache, ở nhiều kích thước collection.
+
+Chỉ đo tra cứu trong bộ nhớ (không cần MongoDB, không tạo JWT): user đầu, giữa,
+cuối danh sách và username không tồn tại. Với index, latency gần như không đổi
+khi số user tăng; với next(...) latency tăng tuyến tính.
+
+Chạy: python benchmarks/bench_login.py [--sizes 1000,10000,100000] [--repeat 200]
+"""
+import argparse
+import hmac
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swagger_server.database.collection_cache import CollectionCache
+
+
+def make_users(n):
+    return [{"id": f"{i:024x}", "username": f"user{i}", "password": f"pass{i}",
+             "email": f"user{i}@example.com", "role": "user"} for i in range(n)]
+
+
+def login_scan(users, username, password):
+    return next((u for u in users if u["username"] == username and u["password"] == password), None)
+
+
+def login_indexed(cache, username, password):
+    user = cache.find("username", username)
+    if user and not hmac.compare_digest(user["password"].encode(), password.encode()):
+        return None
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Login lookup: linear scan vs username index')
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f'{"users":>8} {"case":<8} {"scan µs":>10} {"index µs":>10}')
+    for n in (int(size) for size in args.sizes.split(',')):
+        users = make_users(n)
+        cache = CollectionCache(lambda: users, None, unique=("username",))
+        cache.all()  # load trước, không tính vào thời gian login
+        cases = {'first': 0, 'middle': n // 2, 'last': n - 1}
+        for case, i in list(cases.items()) + [('missing', None)]:
+            username, password = (f'user{i}', f'pass{i}') if i is not None else ('nobody', 'x')
+            assert login_scan(users, username, password) is login_indexed(cache, username, password)
+            scan = timeit.timeit(lambda: login_scan(users, username, password), number=args.repeat)
+            indexed = timeit.timeit(lambda: login_indexed(cache, username, password), number=args.repeat)
+            print(f'{n:>8} {case:<8} {scan / args.repeat * 1e6:>10.2f} {indexed / args.repeat * 1e6:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
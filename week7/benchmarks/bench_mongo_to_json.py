@@ -0,0 +1,55 @@
+"""
+Microbenchmark chuyển document Mongo sang dữ liệu JSON được:
+  - cũ:  json.loads(bson.json_util.dumps(docs))  (encode ra chuỗi rồi parse lại)
+  - mới: converter.mongo_to_json(docs)           (đi qua document một lần)
+
+Document giống kết quả books.find() (ObjectId, kèm một field datetime), kiểm tra
+hai cách cho cùng kết quả trước khi đo.
+
+Cần: pip install pymongo (bson)
+Chạy: python benchmarks/bench_mongo_to_json.py [--docs 10000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime
+
+from bson.json_util import dumps
+from bson.objectid import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swagger_server.database.converter import mongo_to_json
+
+
+def make_books(n):
+    books = []
+    for i in range(n):
+        _id = ObjectId()
+        books.append({"_id": _id, "title": f"Book {i}", "author": f"Author {i % 97}",
+                      "year": 1990 + i % 30, "price": 10.5 + i % 50,
+                      "created_at": datetime(2024, 1, 1, 8, 30, i % 60, 123000),
+                      "id": str(_id)})
+    return books
+
+
+def main():
+    parser = argparse.ArgumentParser(description='bson dumps->json.loads vs direct converter')
+    parser.add_argument('--docs', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    books = make_books(args.docs)
+    assert mongo_to_json(books) == json.loads(dumps(books)), 'converter cho kết quả khác json_util'
+
+    old = timeit.timeit(lambda: json.loads(dumps(books)), number=args.repeat) / args.repeat
+    new = timeit.timeit(lambda: mongo_to_json(books), number=args.repeat) / args.repeat
+    print(f'{args.docs} documents')
+    print(f'json.loads(dumps(...)) {old * 1000:8.2f}ms')
+    print(f'mongo_to_json          {new * 1000:8.2f}ms   x{old / new:.1f}')
+
+
+if __name__ == '__main__':
+    main()
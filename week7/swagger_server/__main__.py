@@ -1,16 +1,38 @@
 #!/usr/bin/env python3
 
+import argparse
+
 import connexion
 
 from swagger_server import encoder
-from .database.database import create_database
+from .database.database import create_database, create_indexes, create_indexes_in_background, watch_caches
 
-def main():
-    create_database()
+
+def create_app():
+    # Không truy cập MongoDB ở đây: client tạo ở request đầu tiên, cache load khi được đọc
     app = connexion.App(__name__, specification_dir='./swagger/')
     app.app.json_encoder = encoder.JSONEncoder
     app.add_api('swagger.yaml', arguments={'title': 'Books Management API'}, pythonic_params=True)
-    app.run(port=8080)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Books Management API')
+    parser.add_argument('command', nargs='?', default='serve', choices=('serve', 'seed', 'create-indexes'),
+                        help='serve (mặc định) | seed: xóa và chèn dữ liệu mẫu | create-indexes')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    if args.command == 'seed':
+        create_database()
+    elif args.command == 'create-indexes':
+        create_indexes()
+    else:
+        app = create_app()
+        # Thread nền, kết nối MongoDB không chặn lúc bind port
+        create_indexes_in_background()
+        watch_caches()
+        app.run(port=args.port)
 
 
 if __name__ == '__main__':
@@ -12,19 +12,19 @@ from swagger_server.models.inline_response201 import InlineResponse201  # noqa:
 from swagger_server import util
 from flask import request, jsonify
 from datetime import datetime, timedelta
+import hmac
 
 import jwt
+from pymongo.errors import DuplicateKeyError
 from ..utils.auth_utils import JWT_REFRESH_EXPIRES_IN, JWT_EXPIRES_IN, JWT_SECRET
 
 from ..utils.auth_utils import authenticate_token, require_admin, generate_token
-from ..database.database import get_all_users, get_all_books_from_db, save_refresh_token, insert_new_user, get_refresh_token
-users = get_all_users()
-books = get_all_books_from_db()
+from ..database.database import user_cache, save_refresh_token, insert_new_user, get_refresh_token
 
 @authenticate_token
 def get_current_user():
     """Lấy thông tin user hiện tại (cần token)"""
-    user = next((u for u in users if u["id"] == request.user["id"]), None)
+    user = user_cache.get(request.user.get("id"))
 
     if not user:
         return jsonify({"success": False, "message": "Không tìm thấy user"}), 404
@@ -73,12 +73,10 @@ def login(body):  # noqa: E501
             400,
         )
     
-    # Tìm user
-    user = next(
-        (u for u in users if u["username"] == username and u["password"] == password),
-        None,
-    )
-
+    # Tìm user theo index username (O(1)), so sánh password thời gian hằng
+    user = user_cache.find("username", username)
+    if user and not hmac.compare_digest(str(user["password"]).encode(), password.encode()):
+        user = None
 
     if not user:
         return (
@@ -145,7 +143,7 @@ def refresh_token(body):  # noqa: E501
         if get_refresh_token(user_id, refresh_token)['token'] != refresh_token:
             return jsonify({"success": False, "message": "Refresh token không hợp lệ"}), 403
         # Cấp lại access token mới
-        user = next((u for u in users if u["id"] == user_id), None)
+        user = user_cache.get(user_id)
         if not user:
             return jsonify({"success": False, "message": "Không tìm thấy user"}), 404
         access_token = generate_token(
@@ -158,6 +156,13 @@ def refresh_token(body):  # noqa: E501
         return jsonify({"success": False, "message": "Refresh token không hợp lệ"}), 403
 
 
+def username_taken():
+    return (
+        jsonify({"success": False, "message": "Username đã tồn tại"}),
+        400,
+    )
+
+
 def register(body):  # noqa: E501
     """Đăng ký tài khoản mới
 
@@ -192,11 +197,8 @@ def register(body):  # noqa: E501
         )
 
     # Kiểm tra username đã tồn tại
-    if any(u["username"] == username for u in users):
-        return (
-            jsonify({"success": False, "message": "Username đã tồn tại"}),
-            400,
-        )
+    if user_cache.find("username", username):
+        return username_taken()
 
     # Tạo user mới (trong thực tế nên hash password)
     new_user = {
@@ -205,7 +207,11 @@ def register(body):  # noqa: E501
         "email": email,
         "role": "user",  # Mặc định là user thường
     }
-    insert_new_user(username, password, email, "user")
+    try:
+        user_cache.put(insert_new_user(username, password, email, "user"))
+    except DuplicateKeyError:
+        # Hai request cùng username lọt qua bước kiểm tra trên: index unique users.username chặn lại
+        return username_taken()
     access_token = generate_token(
         {"username": new_user["username"], "role": new_user["role"]},
     )
@@ -9,9 +9,15 @@ from swagger_server.models.inline_response2011 import InlineResponse2011  # noqa
 from swagger_server import util
 from ..utils.auth_utils import authenticate_token, require_admin
 from datetime import datetime
-from ..database.database import get_all_books_from_db, delete_book_by_id, update_book_by_id, insert_new_book
-books = get_all_books_from_db()
-from flask import jsonify
+from ..database.database import (book_cache, delete_book_by_id, update_book_by_id, insert_new_book,
+                                 find_books, book_to_json, BOOK_FIELDS)
+from bson.objectid import ObjectId
+from flask import Response, jsonify
+from pymongo.errors import PyMongoError
+import itertools
+import json
+
+DEFAULT_LIMIT = 20
 
 @authenticate_token
 def create_book(body):  # noqa: E501
@@ -24,7 +30,6 @@ def create_book(body):  # noqa: E501
 
     :rtype: InlineResponse2011
     """
-    global books
     if not connexion.request.is_json:
         return (
             {
@@ -43,15 +48,8 @@ def create_book(body):  # noqa: E501
         return {"success": False, "message": "Title và Author là bắt buộc"}, 400
         
 
-    new_book = {
-        "title": title,
-        "author": author,
-        "year": year,
-        "price": price,
-    }
-    insert_new_book(title=title, author=author, year=year, price=price)
-    books.append(new_book)
-    books = get_all_books_from_db()
+    new_book = insert_new_book(title=title, author=author, year=year, price=price)
+    book_cache.put(new_book)
     return {"success": True, "data": new_book}, 201
 
 @authenticate_token
@@ -66,27 +64,78 @@ def delete_book(id_):  # noqa: E501
 
     :rtype: InlineResponse2004
     """
-    global books
-    book = next((b for b in books if b["id"] == id_), None)
+    book = book_cache.get(id_)
 
     if not book:
         return {"success": False, "message": "Không tìm thấy sách"}, 404
 
-    books = [b for b in books if b["id"] != id_]
     delete_book_by_id(id_)
-    books = get_all_books_from_db()
+    book_cache.remove(id_)
     return {"success": True, "message": "Xóa sách thành công"}
 
 
-def get_all_books():  # noqa: E501
-    """Lấy danh sách tất cả sách
+def get_all_books(limit=DEFAULT_LIMIT, cursor=None, fields=None, author=None, year_from=None, year_to=None):  # noqa: E501
+    """Lấy danh sách sách (phân trang)
 
-    Trả về danh sách tất cả sách trong hệ thống # noqa: E501
+    Trả về một trang sách theo thứ tự ID. Lọc, chọn field và phân trang được thực hiện trong MongoDB # noqa: E501
 
+    :param limit: Số sách tối đa mỗi trang
+    :type limit: int
+    :param cursor: Giá trị next_cursor của trang trước
+    :type cursor: str
+    :param fields: Các field cần trả về, phân cách bằng dấu phẩy
+    :type fields: str
+    :param author: Lọc theo tác giả
+    :type author: str
+    :param year_from: Năm xuất bản từ
+    :type year_from: int
+    :param year_to: Năm xuất bản đến
+    :type year_to: int
 
     :rtype: InlineResponse2003
     """
-    return {"success": True, "data": books}
+    if cursor and not ObjectId.is_valid(cursor):
+        return {"success": False, "message": "Cursor không hợp lệ"}, 400
+
+    selected = None
+    if fields:
+        selected = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in BOOK_FIELDS]
+        if unknown:
+            return {"success": False, "message": f"Field không hợp lệ: {', '.join(unknown)}"}, 400
+
+    books = find_books(limit, after=cursor, fields=selected, author=author,
+                       year_from=year_from, year_to=year_to)
+    # Đọc batch đầu (cả trang, batch_size = limit + 1) trước khi gửi status 200:
+    # MongoDB lỗi thì còn trả được 503 thay vì một body JSON bị cắt giữa chừng
+    try:
+        first = next(books, None)
+    except PyMongoError:
+        books.close()
+        return {"success": False, "message": "Database không khả dụng"}, 503
+
+    def generate():
+        # Ghi từng sách ngay khi đọc được từ cursor, không giữ cả trang trong bộ nhớ
+        yield '{"success":true,"data":['
+        last_id = None
+        count = 0
+        has_more = False
+        try:
+            for book in itertools.chain([first] if first else [], books):
+                # find_books đọc thêm 1 sách chỉ để biết còn trang sau, không trả về
+                if count == limit:
+                    has_more = True
+                    break
+                book = book_to_json(book)
+                yield ("," if count else "") + json.dumps(book)
+                last_id = book["id"]
+                count += 1
+        finally:
+            # Cả khi client ngắt kết nối giữa chừng (generator bị close)
+            books.close()
+        yield '],"next_cursor":%s}' % json.dumps(last_id if has_more else None)
+
+    return Response(generate(), mimetype="application/json")
 
 
 def get_book_by_id(id_):  # noqa: E501
@@ -99,7 +148,7 @@ def get_book_by_id(id_):  # noqa: E501
 
     :rtype: InlineResponse2011
     """
-    book = next((b for b in books if b["id"] == id_), None)
+    book = book_cache.get(id_)
 
     if not book:
         return {"success": False, "message": "Không tìm thấy sách"}, 404
@@ -129,7 +178,7 @@ def update_book(body, id_):  # noqa: E501
         )
     
     data = BookInput.from_dict(connexion.request.get_json())  # noqa: E501
-    book = next((b for b in books if b["id"] == id_), None)
+    book = book_cache.get(id_)
 
     if not book:
         return {"success": False, "message": "Không tìm thấy sách"}, 404
@@ -144,12 +193,16 @@ def update_book(body, id_):  # noqa: E501
             400,
         )
 
-    book["title"] = title
-    book["author"] = author
-    book["year"] = data.year or book["year"]
-    book["price"] = data.price or book["price"]
-    book_copy = book.copy()
-    book_copy.pop("id", None)
-    book_copy.pop("_id", None)
-    update_book_by_id(id_, book_copy)
+    book = update_book_by_id(id_, {
+        "title": title,
+        "author": author,
+        "year": data.year or book["year"],
+        "price": data.price or book["price"],
+    })
+    if not book:
+        book_cache.remove(id_)
+        return {"success": False, "message": "Không tìm thấy sách"}, 404
+
+    # Document cache là bản mới (không sửa tại chỗ dict đang được request khác đọc)
+    book_cache.put(book)
     return {"success": True, "data": book}
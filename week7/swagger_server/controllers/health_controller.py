@@ -0,0 +1,25 @@
+from ..database.database import ping
+
+
+def health():  # noqa: E501
+    """Liveness
+
+    Process đang chạy (không truy cập MongoDB) # noqa: E501
+
+
+    :rtype: InlineResponseHealth
+    """
+    return {"success": True, "status": "ok"}
+
+
+def ready():  # noqa: E501
+    """Readiness
+
+    Service sẵn sàng nhận request (MongoDB trả lời ping) # noqa: E501
+
+
+    :rtype: InlineResponseHealth
+    """
+    if not ping():
+        return {"success": False, "status": "unavailable"}, 503
+    return {"success": True, "status": "ready"}
@@ -0,0 +1,135 @@
+import threading
+
+# Chờ bao lâu trước khi mở lại change stream bị lỗi (mất kết nối, failover...)
+WATCH_RETRY_SECONDS = 5
+
+
+class CollectionCache:
+    """
+    Cache một collection trong bộ nhớ dạng dict id -> document (đã qua serialize),
+    kèm index phụ cho các field unique (vd. username) để tra cứu O(1).
+
+    - Lần đọc đầu tiên mới load toàn bộ collection (không query lúc import).
+    - Sau khi ghi, controller cập nhật đúng document vừa ghi (put/remove), không load lại cả collection.
+    - watch(get_collection): theo dõi change stream để các worker khác cũng thấy thay đổi.
+    """
+
+    def __init__(self, load, serialize, unique=()):
+        self._load = load            # () -> list document đã serialize (có key "id")
+        self._serialize = serialize  # document Mongo -> dict trả về cho client
+        self._unique = tuple(unique)
+        self._state = None           # (docs, indexes): đổi cả cặp cùng lúc
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def _ensure_loaded(self):
+        state = self._state
+        if state is None:
+            with self._lock:
+                if self._state is None:
+                    docs = {doc["id"]: doc for doc in self._load()}
+                    indexes = {field: {doc.get(field): doc for doc in docs.values()}
+                               for field in self._unique}
+                    self._state = (docs, indexes)
+                state = self._state
+        return state
+
+    def all(self):
+        """Danh sách document theo thứ tự chèn"""
+        with self._lock:
+            return list(self._ensure_loaded()[0].values())
+
+    def get(self, id_):
+        return self._ensure_loaded()[0].get(id_)
+
+    def find(self, field, value):
+        """Document có field (unique) bằng value, ví dụ find("username", "admin")"""
+        return self._ensure_loaded()[1][field].get(value)
+
+    def __len__(self):
+        return len(self._ensure_loaded()[0])
+
+    def put(self, doc):
+        """Thêm / thay document (đã serialize) sau khi ghi"""
+        with self._lock:
+            if self._state is None:
+                return
+            docs, indexes = self._state
+            old = docs.get(doc["id"])
+            for field, index in indexes.items():
+                if old is not None and index.get(old.get(field)) is old:
+                    del index[old.get(field)]
+                index[doc.get(field)] = doc
+            docs[doc["id"]] = doc
+
+    def remove(self, id_):
+        with self._lock:
+            if self._state is None:
+                return
+            docs, indexes = self._state
+            old = docs.pop(id_, None)
+            if old is not None:
+                for field, index in indexes.items():
+                    if index.get(old.get(field)) is old:
+                        del index[old.get(field)]
+
+    def invalidate(self):
+        """Bỏ toàn bộ cache, lần đọc sau load lại"""
+        with self._lock:
+            self._state = None
+
+    # ==================== CHANGE STREAM ====================
+
+    def apply_change(self, change):
+        """Áp dụng một event của change stream (watch với full_document='updateLookup')"""
+        operation = change["operationType"]
+        if operation in ("insert", "replace", "update"):
+            doc = change.get("fullDocument")
+            if doc is None:
+                # update rồi bị xóa trước khi lookup
+                self.remove(str(change["documentKey"]["_id"]))
+            else:
+                self.put(self._serialize(doc))
+        elif operation == "delete":
+            self.remove(str(change["documentKey"]["_id"]))
+        elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            self.invalidate()
+
+    def watch(self, get_collection):
+        """
+        Chạy thread đọc change stream (cần replica set, vd. MongoDB Atlas).
+        get_collection() được gọi trong thread nên kết nối không chặn lúc khởi động.
+        """
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(get_collection,), daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self, get_collection):
+        from pymongo.errors import OperationFailure, PyMongoError
+
+        while not self._stop.is_set():
+            try:
+                with get_collection().watch(full_document="updateLookup", max_await_time_ms=1000) as stream:
+                    # Load lại sau khi stream đã mở: không lỡ thay đổi xảy ra lúc chưa watch
+                    self.invalidate()
+                    while not self._stop.is_set():
+                        change = stream.try_next()
+                        if change is not None:
+                            self.apply_change(change)
+            except OperationFailure as e:
+                # Server standalone không hỗ trợ change stream: chỉ còn cập nhật từ kết quả ghi
+                print(f"Change stream không khả dụng ({e}), cache chỉ cập nhật trong worker này")
+                return
+            except PyMongoError as e:
+                print(f"Change stream lỗi: {e}, thử lại sau {WATCH_RETRY_SECONDS}s")
+                self.invalidate()
+                self._stop.wait(WATCH_RETRY_SECONDS)
@@ -0,0 +1,51 @@
+import json
+from datetime import datetime, timedelta
+from bson.json_util import dumps
+from bson.objectid import ObjectId
+
+# Kiểu JSON gốc: trả về nguyên giá trị, không cần chuyển
+_SCALARS = frozenset((str, int, float, bool, type(None)))
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+def _object_id(value):
+    return {"$oid": str(value)}
+
+
+def _datetime(value):
+    # Cùng format relaxed của bson.json_util: 2024-01-01T08:30:00.123Z
+    offset = value.utcoffset()
+    utc = value.replace(tzinfo=None) - offset if offset else value.replace(tzinfo=None)
+    if utc < _EPOCH:
+        # Trước 1970 (theo UTC) json_util không dùng ISO mà dùng số millisecond
+        return {"$date": {"$numberLong": str((utc - _EPOCH) // _MILLISECOND)}}
+    tz = value.strftime("%z") if offset else "Z"
+    millis = value.microsecond // 1000
+    fraction = ".%03d" % millis if millis else ""
+    return {"$date": value.strftime("%Y-%m-%dT%H:%M:%S") + fraction + tz}
+
+
+_CONVERTERS = {ObjectId: _object_id, datetime: _datetime}
+
+
+def mongo_to_json(data):
+    """
+    Chuyển document Mongo (dict/list lồng nhau) thành dữ liệu JSON được, đi qua
+    document một lần: ObjectId -> {"$oid": ...}, datetime -> {"$date": ...}
+    (giống kết quả json.loads(bson.json_util.dumps(data)) nhưng không tạo chuỗi trung gian)
+    """
+    kind = type(data)
+    if kind in _SCALARS:
+        return data
+    if kind is dict or isinstance(data, dict):  # dict, SON, ...
+        return {key: value if type(value) in _SCALARS else mongo_to_json(value)
+                for key, value in data.items()}
+    if kind is list or kind is tuple:
+        return [mongo_to_json(value) for value in data]
+    converter = _CONVERTERS.get(kind)
+    if converter is not None:
+        return converter(data)
+    # Kiểu BSON hiếm gặp (Decimal128, Binary, ...): dùng json_util cho riêng giá trị này
+    return json.loads(dumps(data))
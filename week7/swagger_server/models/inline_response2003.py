@@ -15,25 +15,30 @@ class InlineResponse2003(Model):
 
     Do not edit the class manually.
     """
-    def __init__(self, success: bool=None, data: List[Book]=None):  # noqa: E501
+    def __init__(self, success: bool=None, data: List[Book]=None, next_cursor: str=None):  # noqa: E501
         """InlineResponse2003 - a model defined in Swagger
 
         :param success: The success of this InlineResponse2003.  # noqa: E501
         :type success: bool
         :param data: The data of this InlineResponse2003.  # noqa: E501
         :type data: List[Book]
+        :param next_cursor: The next_cursor of this InlineResponse2003.  # noqa: E501
+        :type next_cursor: str
         """
         self.swagger_types = {
             'success': bool,
-            'data': List[Book]
+            'data': List[Book],
+            'next_cursor': str
         }
 
         self.attribute_map = {
             'success': 'success',
-            'data': 'data'
+            'data': 'data',
+            'next_cursor': 'next_cursor'
         }
         self._success = success
         self._data = data
+        self._next_cursor = next_cursor
 
     @classmethod
     def from_dict(cls, dikt) -> 'InlineResponse2003':
@@ -87,3 +92,26 @@ class InlineResponse2003(Model):
         """
 
         self._data = data
+
+    @property
+    def next_cursor(self) -> str:
+        """Gets the next_cursor of this InlineResponse2003.
+
+        Cursor của trang tiếp theo (null nếu là trang cuối)  # noqa: E501
+
+        :return: The next_cursor of this InlineResponse2003.
+        :rtype: str
+        """
+        return self._next_cursor
+
+    @next_cursor.setter
+    def next_cursor(self, next_cursor: str):
+        """Sets the next_cursor of this InlineResponse2003.
+
+        Cursor của trang tiếp theo (null nếu là trang cuối)  # noqa: E501
+
+        :param next_cursor: The next_cursor of this InlineResponse2003.
+        :type next_cursor: str
+        """
+
+        self._next_cursor = next_cursor
@@ -0,0 +1,73 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import unittest
+
+from swagger_server.database.collection_cache import CollectionCache
+
+
+def serialize(doc):
+    doc = dict(doc)
+    doc["id"] = str(doc.pop("_id"))
+    return doc
+
+
+class TestCollectionCache(unittest.TestCase):
+    """CollectionCache với dữ liệu trong bộ nhớ thay cho MongoDB"""
+
+    def setUp(self):
+        self.loads = 0
+        self.cache = CollectionCache(self.load, serialize)
+
+    def load(self):
+        self.loads += 1
+        return [{"id": "1", "title": "Clean Code"}, {"id": "2", "title": "Refactoring"}]
+
+    def test_loads_lazily_once(self):
+        self.assertEqual(self.loads, 0)
+        self.assertEqual(self.cache.get("1")["title"], "Clean Code")
+        self.assertEqual(len(self.cache.all()), 2)
+        self.assertEqual(self.loads, 1)
+
+    def test_write_results_update_cache_without_reload(self):
+        self.cache.all()
+        self.cache.put({"id": "3", "title": "Design Patterns"})
+        self.cache.put({"id": "1", "title": "Clean Code 2nd"})
+        self.cache.remove("2")
+        self.assertEqual([b["title"] for b in self.cache.all()], ["Clean Code 2nd", "Design Patterns"])
+        self.assertEqual(self.loads, 1)
+
+    def test_apply_change_stream_events(self):
+        self.cache.all()
+        self.cache.apply_change({"operationType": "insert", "documentKey": {"_id": "3"},
+                                 "fullDocument": {"_id": "3", "title": "DDD"}})
+        self.cache.apply_change({"operationType": "update", "documentKey": {"_id": "1"},
+                                 "fullDocument": {"_id": "1", "title": "Clean Architecture"}})
+        self.cache.apply_change({"operationType": "delete", "documentKey": {"_id": "2"}})
+        # update của document đã bị xóa: không có fullDocument
+        self.cache.apply_change({"operationType": "update", "documentKey": {"_id": "3"},
+                                 "fullDocument": None})
+        self.assertEqual(self.cache.all(), [{"id": "1", "title": "Clean Architecture"}])
+
+        self.cache.apply_change({"operationType": "drop"})
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.loads, 2)
+
+    def test_unique_index_follows_writes(self):
+        users = CollectionCache(lambda: [{"id": "1", "username": "admin"}], serialize,
+                                unique=("username",))
+        self.assertEqual(users.find("username", "admin")["id"], "1")
+
+        users.put({"id": "1", "username": "root"})
+        users.put({"id": "2", "username": "user"})
+        self.assertIsNone(users.find("username", "admin"))
+        self.assertEqual(users.find("username", "root")["id"], "1")
+
+        users.remove("1")
+        self.assertIsNone(users.find("username", "root"))
+        self.assertEqual(users.find("username", "user")["id"], "2")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# coding: utf-8
+
+from __future__ import absolute_import
+
+import json
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from bson.decimal128 import Decimal128
+from bson.json_util import dumps
+from bson.objectid import ObjectId
+from bson.son import SON
+
+from swagger_server.database.converter import mongo_to_json
+
+ICT = timezone(timedelta(hours=7))
+
+
+class TestMongoToJson(unittest.TestCase):
+    """mongo_to_json phải cho cùng kết quả với json.loads(bson.json_util.dumps(...))"""
+
+    def assertSameAsJsonUtil(self, data):
+        self.assertEqual(mongo_to_json(data), json.loads(dumps(data)))
+
+    def test_datetimes(self):
+        values = [
+            datetime(2024, 1, 1, 8, 30, 0, 123456),
+            datetime(1970, 1, 1),
+            datetime(2024, 1, 1, tzinfo=timezone.utc),
+            datetime(2024, 1, 1, 8, 30, tzinfo=ICT),
+            # Trước epoch: {"$numberLong": ...}
+            datetime(1960, 1, 1),
+            datetime(1969, 12, 31, 23, 59, 59, 999500),
+            datetime(1900, 6, 15, 12, 0, tzinfo=ICT),
+            # Sau epoch theo giờ địa phương nhưng trước epoch theo UTC
+            datetime(1970, 1, 1, 3, 0, tzinfo=ICT),
+        ]
+        for value in values:
+            with self.subTest(value=value):
+                self.assertSameAsJsonUtil({"at": value})
+
+    def test_pre_epoch_uses_number_long(self):
+        self.assertEqual(mongo_to_json(datetime(1960, 1, 1)),
+                         {"$date": {"$numberLong": "-315619200000"}})
+
+    def test_object_id_and_nested_documents(self):
+        self.assertSameAsJsonUtil([
+            {"_id": ObjectId(), "title": "Clean Code", "year": 2008, "price": 10.5, "tags": ["a", "b"],
+             "meta": {"created_at": datetime(1965, 3, 1), "owner": {"_id": ObjectId(), "active": True}},
+             "history": [{"at": datetime(2020, 5, 1, tzinfo=ICT)}, None]},
+            SON([("_id", ObjectId()), ("nested", SON([("n", 1)]))]),
+        ])
+
+    def test_other_bson_types_fall_back_to_json_util(self):
+        self.assertSameAsJsonUtil({"price": Decimal128("10.50")})
+
+
+if __name__ == '__main__':
+    unittest.main()